@@ -6,6 +6,7 @@ import logging
 import os
 import re
 import sys
+import time
 import typing
 from datetime import datetime
 from types import SimpleNamespace
@@ -30,12 +31,29 @@ except ImportError:
     pass
 
 from core import checks
+from core.archive import LogArchiver
+from core.attachments import AttachmentMirror
+from core.audit import AuditLogWatcher
+from core.categories import CategoryManager
+from core.channel_names import ChannelNameIndex
 from core.clients import ApiClient, PluginDatabaseClient, MongoDBClient
 from core.config import ConfigManager
+from core.exporter import MetricsExporter
+from core.flood import FloodControl
+from core.journal import Journal
+from core.logviewer import LogViewer
+from core.metrics import MetricsRegistry
 from core.utils import human_join, normalize_alias
 from core.models import PermissionLevel, SafeFormatter, getLogger, configure_logging
+from core.pool import ChannelPool
+from core.reconcile import ThreadReconciler
 from core.thread import ThreadManager
+from core.tracing import Tracer, link, span
+from core.stats import SupportStats
 from core.time import human_timedelta
+from core.transcript import TranscriptManager
+from core.typing_relay import TypingRelay
+from core.webhooks import ThreadWebhooks
 
 
 logger = getLogger(__name__)
@@ -60,12 +78,31 @@ class ModmailBot(commands.Bot):
         self.formatter = SafeFormatter()
         self.loaded_cogs = ["cogs.Soporte", "cogs.Utilidades"]
         self._connected = asyncio.Event()
+        self.connect_timings = {}
+        self.reconnect_count = 0
         self.start_time = datetime.utcnow()
 
         self.config = ConfigManager(self)
         self.config.populate_cache()
 
+        self.metrics = MetricsRegistry()
         self.threads = ThreadManager(self)
+        self.audit_logs = AuditLogWatcher(self)
+        self.typing_relay = TypingRelay(self)
+        self.flood_control = FloodControl(self)
+        self.reconciler = ThreadReconciler(self)
+        self.channel_pool = ChannelPool(self)
+        self.categories = CategoryManager(self)
+        self.channel_names = ChannelNameIndex(self)
+        self.webhooks = ThreadWebhooks(self)
+        self.attachment_mirror = AttachmentMirror(self)
+        self.log_viewer = LogViewer(self)
+        self.transcripts = TranscriptManager(self)
+        self.stats = SupportStats(self)
+        self.archiver = LogArchiver(self)
+        self.journal = Journal(self)
+        self.exporter = MetricsExporter(self)
+        self.tracer = Tracer(self)
 
         self.log_file_name = os.path.join(temp_dir, f"{self.token.split('.')[0]}.log")
         self._configure_logging()
@@ -167,6 +204,8 @@ class ModmailBot(commands.Bot):
             logger.critical("Fatal exception", exc_info=True)
         finally:
             self.loop.run_until_complete(self.logout())
+            self.loop.run_until_complete(self.transcripts.close())
+            self.loop.run_until_complete(self.journal.close())
             for task in asyncio.all_tasks(self.loop):
                 task.cancel()
             try:
@@ -174,6 +213,8 @@ class ModmailBot(commands.Bot):
             except asyncio.CancelledError:
                 logger.debug("All pending tasks has been cancelled.")
             finally:
+                self.loop.run_until_complete(self.log_viewer.stop())
+                self.loop.run_until_complete(self.exporter.stop())
                 self.loop.run_until_complete(self.session.close())
                 logger.error(" - Shutting down bot - ")
 
@@ -366,17 +407,54 @@ class ModmailBot(commands.Bot):
             return PermissionLevel.INVALID
         return level
 
+    async def _connect_phase(self, name: str, func: typing.Callable[[], typing.Awaitable]):
+        started = time.perf_counter()
+        try:
+            return await func()
+        finally:
+            self.connect_timings[name] = time.perf_counter() - started
+            logger.debug(
+                "Connection phase %s took %.3f seconds.", name, self.connect_timings[name]
+            )
+
     async def on_connect(self):
+        if self._connected.is_set():
+            # Everything is initialised already, reconnects only check the database is reachable
+            self.reconnect_count += 1
+            try:
+                await self._connect_phase("health_check", self.api.ping)
+            except Exception:
+                logger.warning("Database health check failed after reconnecting.", exc_info=True)
+            else:
+                logger.debug("Reconnected to gateway.")
+            return
+
         try:
-            await self.api.validate_database_connection()
+            await self._connect_phase("validate_database", self.api.validate_database_connection)
         except Exception:
             logger.debug("Logging out due to failed database connection.")
             return await self.logout()
 
         logger.debug("Connected to gateway.")
-        await self.config.refresh()
-        await self.api.setup_indexes()
+        # Writes journaled before a restart go first, the next config update
+        # would write the cached config over a config change that's still pending
+        self.journal.start()
+        if self.journal.pending:
+            drained = await self._connect_phase("replay_journal", lambda: self.journal.drain(30))
+            if not drained:
+                logger.warning(
+                    "%d journal entries are still pending, the config may be out of date.",
+                    self.journal.pending,
+                )
+        await self._connect_phase("refresh_config", self.config.refresh)
+        await self._connect_phase("setup_indexes", self.api.setup_indexes)
+        self.journal.start()
         self._connected.set()
+        logger.info(
+            "Initialised in %.2f seconds (%s).",
+            sum(self.connect_timings.values()),
+            ", ".join(f"{k}: {v:.2f}s" for k, v in self.connect_timings.items()),
+        )
 
     async def on_ready(self):
         """Bot startup, sets uptime."""
@@ -404,77 +482,25 @@ class ModmailBot(commands.Bot):
             logger.info("Receiving guild ID: %s", self.modmail_guild.id)
         logger.line()
 
-        await self.threads.populate_cache()
-
-        # closures
-        closures = self.config["closures"]
-        logger.info("There are %d thread(s) pending to be closed.", len(closures))
-        logger.line()
-
-        for recipient_id, items in tuple(closures.items()):
-            after = (datetime.fromisoformat(items["time"]) - datetime.utcnow()).total_seconds()
-            if after <= 0:
-                logger.debug("Closing thread for recipient %s.", recipient_id)
-                after = 0
-            else:
-                logger.debug(
-                    "Thread for recipient %s will be closed after %s seconds.", recipient_id, after
-                )
-
-            thread = await self.threads.find(recipient_id=int(recipient_id))
-
-            if not thread:
-                # If the channel is deleted
-                logger.debug("Failed to close thread for recipient %s.", recipient_id)
-                self.config["closures"].pop(recipient_id)
-                await self.config.update()
-                continue
-
-            await thread.close(
-                closer=self.get_user(items["closer_id"]),
-                after=after,
-                silent=items["silent"],
-                delete_channel=items["delete_channel"],
-                message=items["message"],
-                auto_close=items.get("auto_close", False),
+        # Cache population, pending closures and orphaned logs are handled in the background
+        self.reconciler.start()
+        self.archiver.start()
+        self.channel_pool.start()
+        await self.log_viewer.start()
+        await self.exporter.start()
+
+        if self.metadata_loop is None:
+            self.metadata_loop = tasks.Loop(
+                self.post_metadata,
+                seconds=0,
+                minutes=0,
+                hours=1,
+                count=None,
+                reconnect=True,
+                loop=None,
             )
-
-        for log in await self.api.get_open_logs():
-            if self.get_channel(int(log["channel_id"])) is None:
-                logger.debug("Unable to resolve thread with channel %s.", log["channel_id"])
-                log_data = await self.api.post_log(
-                    log["channel_id"],
-                    {
-                        "open": False,
-                        "closed_at": str(datetime.utcnow()),
-                        "close_message": "Channel has been deleted, no closer found.",
-                        "closer": {
-                            "id": str(self.user.id),
-                            "name": self.user.name,
-                            "discriminator": self.user.discriminator,
-                            "avatar_url": str(self.user.avatar_url),
-                            "mod": True,
-                        },
-                    },
-                )
-                if log_data:
-                    logger.debug("Successfully closed thread with channel %s.", log["channel_id"])
-                else:
-                    logger.debug(
-                        "Failed to close thread with channel %s, skipping.", log["channel_id"]
-                    )
-
-        self.metadata_loop = tasks.Loop(
-            self.post_metadata,
-            seconds=0,
-            minutes=0,
-            hours=1,
-            count=None,
-            reconnect=True,
-            loop=None,
-        )
-        self.metadata_loop.before_loop(self.before_post_metadata)
-        self.metadata_loop.start()
+            self.metadata_loop.before_loop(self.before_post_metadata)
+            self.metadata_loop.start()
 
         other_guilds = [
             guild for guild in self.guilds if guild not in {self.guild, self.modmail_guild}
@@ -603,10 +629,10 @@ class ModmailBot(commands.Bot):
         logger.debug("User blocked, user %s.", author.name)
         return False
 
-    async def _process_blocked(self, message):
+    async def _process_blocked(self, message, react_to=None):
         _, blocked_emoji = await self.retrieve_emoji()
         if await self.is_blocked(message.author, channel=message.channel, send_message=True):
-            await self.add_reaction(message, blocked_emoji)
+            await self.add_reaction(react_to or message, blocked_emoji)
             return True
         return False
 
@@ -697,64 +723,93 @@ class ModmailBot(commands.Bot):
 
     async def process_dm_modmail(self, message: discord.Message) -> None:
         """Processes messages sent to the bot."""
-        blocked = await self._process_blocked(message)
+        if not self.flood_control.allow(message):
+            return
+        await self.relay_dm_modmail(message)
+
+    async def relay_dm_modmail(self, message: discord.Message, *, react_to=None) -> None:
+        """
+        Relays a DM, or a merged batch of DMs, to its thread.
+        Reactions are added to `react_to`, defaulting to `message`.
+        The relay is traced under the IDs of both, see `debug trace`.
+        """
+        react_to = react_to or message
+        with self.tracer.trace("relay_dm_modmail", message.id):
+            link(react_to.id)
+            await self._relay_dm_modmail(message, react_to)
+
+    async def _relay_dm_modmail(self, message: discord.Message, react_to) -> None:
+        with span("is_blocked"):
+            blocked = await self._process_blocked(message, react_to)
         if blocked:
             return
         sent_emoji, blocked_emoji = await self.retrieve_emoji()
 
-        thread = await self.threads.find(recipient=message.author)
-        if thread is None:
-            delta = await self.get_thread_cooldown(message.author)
-            if delta:
-                await message.channel.send(
-                    embed=discord.Embed(
-                        title="Message not sent!",
-                        description=f"You must wait for {delta} before you can contact me again.",
-                        color=self.error_color,
+        async with self.threads.guard(message.author.id):
+            with span("threads.find"):
+                thread = await self.threads.find(recipient=message.author)
+            if thread is None:
+                with span("get_thread_cooldown"):
+                    delta = await self.get_thread_cooldown(message.author)
+                if delta:
+                    await message.channel.send(
+                        embed=discord.Embed(
+                            title="Message not sent!",
+                            description=f"You must wait for {delta} before you can contact me again.",
+                            color=self.error_color,
+                        )
                     )
-                )
-                return
+                    return
 
-            if self.config["dm_disabled"] >= 1:
-                embed = discord.Embed(
-                    title=self.config["disabled_new_thread_title"],
-                    color=self.error_color,
-                    description=self.config["disabled_new_thread_response"],
-                )
-                embed.set_footer(
-                    text=self.config["disabled_new_thread_footer"], icon_url=self.guild.icon_url
-                )
-                logger.info(
-                    "A new thread was blocked from %s due to disabled Modmail.", message.author
-                )
-                await self.add_reaction(message, blocked_emoji)
-                return await message.channel.send(embed=embed)
+                if self.config["dm_disabled"] >= 1:
+                    embed = discord.Embed(
+                        title=self.config["disabled_new_thread_title"],
+                        color=self.error_color,
+                        description=self.config["disabled_new_thread_response"],
+                    )
+                    embed.set_footer(
+                        text=self.config["disabled_new_thread_footer"],
+                        icon_url=self.guild.icon_url,
+                    )
+                    logger.info(
+                        "A new thread was blocked from %s due to disabled Modmail.", message.author
+                    )
+                    await self.add_reaction(react_to, blocked_emoji)
+                    return await message.channel.send(embed=embed)
 
-            thread = await self.threads.create(message.author)
-        else:
-            if self.config["dm_disabled"] == 2:
-                embed = discord.Embed(
-                    title=self.config["disabled_current_thread_title"],
-                    color=self.error_color,
-                    description=self.config["disabled_current_thread_response"],
-                )
-                embed.set_footer(
-                    text=self.config["disabled_current_thread_footer"],
-                    icon_url=self.guild.icon_url,
-                )
-                logger.info(
-                    "A message was blocked from %s due to disabled Modmail.", message.author
-                )
-                await self.add_reaction(message, blocked_emoji)
-                return await message.channel.send(embed=embed)
+                with span("threads.create"):
+                    thread = await self.threads.create(message.author)
+            else:
+                if self.config["dm_disabled"] == 2:
+                    embed = discord.Embed(
+                        title=self.config["disabled_current_thread_title"],
+                        color=self.error_color,
+                        description=self.config["disabled_current_thread_response"],
+                    )
+                    embed.set_footer(
+                        text=self.config["disabled_current_thread_footer"],
+                        icon_url=self.guild.icon_url,
+                    )
+                    logger.info(
+                        "A message was blocked from %s due to disabled Modmail.", message.author
+                    )
+                    await self.add_reaction(react_to, blocked_emoji)
+                    return await message.channel.send(embed=embed)
 
+        started = time.perf_counter()
         try:
             await thread.send(message)
         except Exception:
             logger.error("Failed to send message:", exc_info=True)
-            await self.add_reaction(message, blocked_emoji)
+            with span("add_reaction"):
+                await self.add_reaction(react_to, blocked_emoji)
         else:
-            await self.add_reaction(message, sent_emoji)
+            self.metrics.counter("relay_messages_total", direction="to_thread").inc()
+            self.metrics.histogram("relay_seconds", direction="to_thread").record(
+                time.perf_counter() - started
+            )
+            with span("add_reaction"):
+                await self.add_reaction(react_to, sent_emoji)
 
     async def get_contexts(self, message, *, cls=commands.Context):
         """
@@ -906,23 +961,7 @@ class ModmailBot(commands.Bot):
         if user.bot:
             return
 
-        if isinstance(channel, discord.DMChannel):
-            if not self.config.get("user_typing"):
-                return
-
-            thread = await self.threads.find(recipient=user)
-
-            if thread:
-                await thread.channel.trigger_typing()
-        else:
-            if not self.config.get("mod_typing"):
-                return
-
-            thread = await self.threads.find(channel=channel)
-            if thread is not None and thread.recipient:
-                if await self.is_blocked(thread.recipient):
-                    return
-                await thread.recipient.trigger_typing()
+        await self.typing_relay.relay(channel, user)
 
     async def handle_reaction_events(self, payload):
         user = self.get_user(payload.user_id)
@@ -997,10 +1036,27 @@ class ModmailBot(commands.Bot):
     async def on_raw_reaction_remove(self, payload):
         await self.handle_reaction_events(payload)
 
+    async def on_guild_channel_create(self, channel):
+        if channel.guild != self.modmail_guild:
+            return
+        self.categories.on_channel_create(channel)
+        self.channel_names.on_channel_create(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        if after.guild != self.modmail_guild:
+            return
+        self.categories.on_channel_update(before, after)
+        self.channel_names.on_channel_update(before, after)
+
     async def on_guild_channel_delete(self, channel):
         if channel.guild != self.modmail_guild:
             return
 
+        since = self.audit_logs.now()
+        self.categories.on_channel_delete(channel)
+        self.channel_names.on_channel_delete(channel)
+        self.webhooks.on_channel_delete(channel)
+
         if isinstance(channel, discord.CategoryChannel):
             if self.main_category == channel:
                 logger.debug("Main category was deleted.")
@@ -1017,10 +1073,11 @@ class ModmailBot(commands.Bot):
             await self.config.update()
             return
 
-        audit_logs = self.modmail_guild.audit_logs(
-            limit=10, action=discord.AuditLogAction.channel_delete
+        entry = await self.audit_logs.find(
+            discord.AuditLogAction.channel_delete,
+            lambda a: int(a.target.id) == channel.id,
+            since=since,
         )
-        entry = await audit_logs.find(lambda a: int(a.target.id) == channel.id)
 
         if entry is None:
             logger.debug("Cannot find the audit log entry for channel delete of %d.", channel.id)
@@ -1057,7 +1114,9 @@ class ModmailBot(commands.Bot):
 
     async def on_message_delete(self, message):
         """Support for deleting linked messages"""
+        await self._handle_message_delete(message, since=self.audit_logs.now())
 
+    async def _handle_message_delete(self, message, *, since: float):
         if message.is_system():
             return
 
@@ -1075,7 +1134,11 @@ class ModmailBot(commands.Bot):
                 return
             embed = message.embeds[0]
             embed.set_footer(text=f"{embed.footer.text} (deleted)", icon_url=embed.footer.icon_url)
-            await message.edit(embed=embed)
+            if message.webhook_id is not None:
+                # Relayed by the thread webhook, the bot can't edit it itself
+                await self.webhooks.edit_message(message, embed=embed)
+            else:
+                await message.edit(embed=embed)
             return
 
         if message.author != self.user:
@@ -1085,12 +1148,10 @@ class ModmailBot(commands.Bot):
         if not thread:
             return
 
-        audit_logs = self.modmail_guild.audit_logs(
-            limit=10, action=discord.AuditLogAction.message_delete
+        entry = await self.audit_logs.find(
+            discord.AuditLogAction.message_delete, lambda a: a.target == self.user, since=since
         )
 
-        entry = await audit_logs.find(lambda a: a.target == self.user)
-
         if entry is None:
             return
 
@@ -1113,7 +1174,11 @@ class ModmailBot(commands.Bot):
         return await message.channel.send(embed=embed)
 
     async def on_bulk_message_delete(self, messages):
-        await discord.utils.async_all(self.on_message_delete(msg) for msg in messages)
+        # A shared timestamp lets every message resolve against the same audit log fetch
+        since = self.audit_logs.now()
+        await discord.utils.async_all(
+            self._handle_message_delete(msg, since=since) for msg in messages
+        )
 
     async def on_message_edit(self, before, after):
         if after.author.bot:
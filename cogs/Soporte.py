@@ -1,4 +1,6 @@
 import asyncio
+import io
+import os
 import re
 from datetime import datetime
 from itertools import zip_longest
@@ -13,8 +15,10 @@ from dateutil import parser
 from natural.date import duration
 
 from core import checks
+from core.backup import LogFilter, export_logs, import_logs
 from core.models import PermissionLevel, getLogger
-from core.paginator import EmbedPaginatorSession
+from core.paginator import CursorPaginatorSession, EmbedPaginatorSession
+from core.stats import format_seconds
 from core.thread import Thread
 from core.time import UserFriendlyTime, human_timedelta
 from core.utils import *
@@ -623,6 +627,104 @@ class Soporte(commands.Cog):
         session = EmbedPaginatorSession(ctx, *embeds)
         await session.run()
 
+    @staticmethod
+    def _backup_dir() -> str:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "temp", "backups")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _progress(self, message: discord.Message, title: str):
+        last_edit = 0
+
+        async def progress(done, total):
+            nonlocal last_edit
+            now = self.bot.loop.time()
+            if now - last_edit < 5:
+                return
+            last_edit = now
+            description = f"{done}/{total} registros" if total is not None else f"{done} registros"
+            await message.edit(
+                embed=discord.Embed(
+                    title=title, description=description, color=self.bot.main_color
+                )
+            )
+
+        return progress
+
+    @logs.command(name="export")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def logs_export(self, ctx, *, filtros: str = ""):
+        """
+        Exporta los registros a un archivo JSONL comprimido con gzip.
+
+        Los filtros son opcionales: `servidor=<ID>` (este servidor por defecto,
+        `todos` para cualquiera), `desde=AAAA-MM-DD`, `hasta=AAAA-MM-DD` (sin
+        incluir) y `claves=<primera>..<última>`.
+        """
+        try:
+            log_filter = LogFilter.parse(filtros, guild_id=str(self.bot.guild_id))
+        except ValueError as e:
+            raise commands.BadArgument(str(e))
+
+        filename = f"logs-{datetime.utcnow():%Y%m%d-%H%M%S}.jsonl.gz"
+        path = os.path.join(self._backup_dir(), filename)
+        message = await ctx.send(
+            embed=discord.Embed(title="Exportando registros...", color=self.bot.main_color)
+        )
+        count = await export_logs(
+            self.bot.api.analytics_logs,
+            path,
+            log_filter,
+            archive=self.bot.api.analytics_db.archived_logs,
+            progress=self._progress(message, "Exportando registros..."),
+        )
+
+        embed = discord.Embed(
+            title="Éxito",
+            description=f"Se han exportado {count} registros a `{filename}`.",
+            color=self.bot.main_color,
+        )
+        await message.edit(embed=embed)
+        if os.path.getsize(path) <= 8 * 1024 * 1024:
+            await ctx.send(file=discord.File(path, filename=filename))
+
+    @logs.command(name="import")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def logs_import(self, ctx, archivo: str = None):
+        """
+        Importa los registros de un archivo creado con `logs export`.
+
+        Adjunta el archivo al mensaje o indica el nombre de un archivo de
+        `temp/backups`. Los registros que ya existen se omiten y, si la
+        importación se interrumpe, volver a ejecutarla continúa donde se quedó.
+        """
+        if ctx.message.attachments:
+            attachment = ctx.message.attachments[0]
+            path = os.path.join(self._backup_dir(), os.path.basename(attachment.filename))
+            await attachment.save(path)
+        elif archivo is not None:
+            path = os.path.join(self._backup_dir(), os.path.basename(archivo))
+        else:
+            raise commands.MissingRequiredArgument(SimpleNamespace(name="archivo"))
+
+        if not os.path.exists(path):
+            raise commands.BadArgument(f"Archivo `{os.path.basename(path)}` no encontrado.")
+
+        message = await ctx.send(
+            embed=discord.Embed(title="Importando registros...", color=self.bot.main_color)
+        )
+        result = await import_logs(
+            self.bot.api.logs, path, progress=self._progress(message, "Importando registros...")
+        )
+
+        embed = discord.Embed(
+            title="Éxito",
+            description=f"Se han importado {result.inserted} registros, "
+            f"{result.skipped} ya existían.",
+            color=self.bot.main_color,
+        )
+        await message.edit(embed=embed)
+
     @logs.command(name="delete", aliases=["wipe"])
     @checks.has_permissions(PermissionLevel.OWNER)
     async def logs_delete(self, ctx, key_or_link: str):
@@ -657,19 +759,25 @@ class Soporte(commands.Cog):
         `user` puede ser la ID de usuario, una mención o un nombre.
         """
         user = user if user is not None else ctx.author
+        before = None
 
-        entries = await self.bot.api.get_responded_logs(user.id)
+        async def fetch():
+            nonlocal before
+            entries = await self.bot.api.get_responded_logs(user.id, before=before)
+            if entries:
+                before = entries[-1]["closed_at"]
+            return self.format_log_embeds(entries, avatar_url=self.bot.guild.icon_url)
 
-        embeds = self.format_log_embeds(entries, avatar_url=self.bot.guild.icon_url)
+        session = CursorPaginatorSession(ctx, fetch)
+        await session.load_more()
 
-        if not embeds:
+        if not session.pages:
             embed = discord.Embed(
                 color=self.bot.error_color,
                 description=f"{getattr(user, 'mention', user.id)} has not responded to any threads.",
             )
             return await ctx.send(embed=embed)
 
-        session = EmbedPaginatorSession(ctx, *embeds)
         await session.run()
 
     @logs.command(name="search", aliases=["find"])
@@ -696,6 +804,69 @@ class Soporte(commands.Cog):
         session = EmbedPaginatorSession(ctx, *embeds)
         await session.run()
 
+    @staticmethod
+    def _average(counters: dict, total: str, count: str) -> Optional[float]:
+        if not counters[count]:
+            return None
+        return counters[total] / counters[count]
+
+    @commands.group(invoke_without_command=True)
+    @checks.has_permissions(PermissionLevel.MODERATOR)
+    async def stats(self, ctx, días: int = 30):
+        """
+        Muestra el volumen de tickets, los tiempos de respuesta y la carga
+        de cada moderador durante los últimos `días` días.
+        """
+        días = max(1, min(días, 365))
+        totals = self.bot.stats.summarize(await self.bot.stats.fetch(días))
+        guild = totals["guild"][""]
+
+        embed = discord.Embed(
+            title=f"Estadísticas de los últimos {días} días", color=self.bot.main_color
+        )
+        embed.add_field(name="Tickets abiertos", value=str(guild["opened"]))
+        embed.add_field(name="Tickets cerrados", value=str(guild["closed"]))
+        embed.add_field(name="Tickets respondidos", value=str(guild["responded"]))
+        embed.add_field(
+            name="Primera respuesta media",
+            value=format_seconds(self._average(guild, "first_response_seconds", "responded")),
+        )
+        embed.add_field(
+            name="Duración media",
+            value=format_seconds(self._average(guild, "handle_seconds", "closed")),
+        )
+
+        mods = sorted(totals["mod"].items(), key=lambda item: item[1]["replies"], reverse=True)
+        lines = []
+        for mod_id, counters in mods[:10]:
+            first_response = self._average(counters, "first_response_seconds", "responded")
+            lines.append(
+                f"<@{mod_id}>: {counters['replies']} respuestas, "
+                f"{counters['responded']} atendidos, {counters['closed']} cerrados, "
+                f"primera respuesta {format_seconds(first_response)}"
+            )
+        if lines:
+            embed.add_field(name="Moderadores", value="\n".join(lines)[:1024], inline=False)
+
+        lines = []
+        for category_id, counters in totals["category"].items():
+            category = self.bot.get_channel(int(category_id))
+            name = category.name if category is not None else category_id
+            lines.append(f"{name}: {counters['opened']} abiertos, {counters['closed']} cerrados")
+        if lines:
+            embed.add_field(name="Categorías", value="\n".join(lines)[:1024], inline=False)
+
+        await ctx.send(embed=embed)
+
+    @stats.command(name="export")
+    @checks.has_permissions(PermissionLevel.MODERATOR)
+    async def stats_export(self, ctx, días: int = 30):
+        """Exporta los contadores diarios de los últimos `días` días como CSV."""
+        días = max(1, min(días, 365))
+        rollups = await self.bot.stats.fetch(días)
+        data = self.bot.stats.to_csv(rollups).encode("utf-8")
+        await ctx.send(file=discord.File(io.BytesIO(data), filename=f"stats-{días}d.csv"))
+
     @commands.command()
     @checks.has_permissions(PermissionLevel.SUPPORTER)
     @checks.thread_only()
@@ -805,7 +976,11 @@ class Soporte(commands.Cog):
             )
             return await ctx.send(embed=embed)
 
-        exists = await self.bot.threads.find(recipient=user)
+        async with self.bot.threads.guard(user.id):
+            exists = await self.bot.threads.find(recipient=user)
+            if not exists:
+                thread = await self.bot.threads.create(user, creator=ctx.author, category=category)
+
         if exists:
             embed = discord.Embed(
                 color=self.bot.error_color,
@@ -815,13 +990,12 @@ class Soporte(commands.Cog):
             await ctx.channel.send(embed=embed)
 
         else:
-            thread = await self.bot.threads.create(user, creator=ctx.author, category=category)
             if self.bot.config["dm_disabled"] >= 1:
                 logger.info("Contacting user %s when Modmail DM is disabled.", user)
 
             embed = discord.Embed(
                 title="Ticket Creado",
-                description=f"Ticket iniciado por {ctx.author.mention} para {usuario.mention}.",
+                description=f"Ticket iniciado por {ctx.author.mention} para {user.mention}.",
                 color=self.bot.main_color,
             )
             await thread.wait_until_ready()
@@ -1145,9 +1319,7 @@ class Soporte(commands.Cog):
             )
             if len(users) == 1:
                 user = users.pop()
-                name = format_channel_name(
-                    user, self.bot.modmail_guild, exclude_channel=ctx.channel
-                )
+                name = self.bot.channel_names.reserve(user, exclude_channel=ctx.channel)
                 recipient = self.bot.get_user(user.id)
                 if user.id in self.bot.threads.cache:
                     thread = self.bot.threads.cache[user.id]
@@ -1175,9 +1347,14 @@ class Soporte(commands.Cog):
                     )
                 thread.ready = True
                 logger.info("Estableciendo el tema del canal actual a la ID de usuario y creando un nuevo ticket.")
-                await ctx.channel.edit(
-                    reason="Reparar ticket de RequiemSupport roto", name=name, topic=f"ID de Usuario: {user.id}"
-                )
+                renamed = None
+                try:
+                    await ctx.channel.edit(
+                        reason="Reparar ticket de RequiemSupport roto", name=name, topic=f"ID de Usuario: {user.id}"
+                    )
+                    renamed = ctx.channel
+                finally:
+                    self.bot.channel_names.release(name, renamed)
                 return await self.bot.add_reaction(ctx.message, sent_emoji)
 
             elif len(users) >= 2:
@@ -407,6 +407,116 @@ class Utilidades(commands.Cog):
             )
         )
 
+    @debug.command(name="pool")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_pool(self, ctx):
+        """Muestra el estado de la reserva de canales y el tiempo de creación de tickets."""
+        pool = self.bot.channel_pool
+
+        embed = discord.Embed(title="Reserva de canales", color=self.bot.main_color)
+        embed.add_field(name="Canales disponibles", value=f"{len(pool)}/{pool.target_size}")
+        embed.add_field(name="Canales utilizados", value=str(pool.claimed))
+        for source, name in (("pool", "Desde la reserva"), ("create", "Creados al momento")):
+            histogram = self.bot.metrics.histogram("thread_channel_seconds", source=source)
+            embed.add_field(name=name, value=f"`{histogram.summary()}`", inline=False)
+        await ctx.send(embed=embed)
+
+    @debug.command(name="journal")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_journal(self, ctx):
+        """Muestra el estado del diario de escrituras en la base de datos."""
+        journal = self.bot.journal
+
+        embed = discord.Embed(title="Diario de escrituras", color=self.bot.main_color)
+        embed.add_field(name="Activado", value="Sí" if journal.enabled else "No")
+        embed.add_field(name="Entradas pendientes", value=str(journal.pending))
+        embed.add_field(name="Retraso", value=f"{journal.lag:.2f} s")
+        embed.add_field(name="Disyuntor", value=journal.breaker.state)
+        histogram = self.bot.metrics.histogram("journal_fsync_seconds")
+        embed.add_field(name="Escritura en disco", value=f"`{histogram.summary()}`", inline=False)
+        await ctx.send(embed=embed)
+
+    @debug.command(name="db")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_db(self, ctx):
+        """Muestra cuánto tardan las operaciones en la base de datos."""
+        metrics = self.bot.metrics
+        rows = []
+        for _, labels, histogram in metrics.collect("db_operation_seconds"):
+            op = labels["op"]
+            errors = sum(
+                counter.value
+                for _, error_labels, counter in metrics.collect("db_operation_errors_total")
+                if error_labels["op"] == op
+            )
+            in_flight = metrics.gauge("db_operations_in_flight", op=op).value
+            rows.append((histogram.total, op, histogram, errors, in_flight))
+        rows.sort(reverse=True)
+
+        embed = discord.Embed(title="Operaciones en la base de datos", color=self.bot.main_color)
+        if not rows:
+            embed.description = "Todavía no se ha hecho ninguna operación."
+            return await ctx.send(embed=embed)
+
+        lines = [f"{'operación':<24}{'n':>7}{'p50':>8}{'p99':>8}{'máx':>8}{'err':>5}{'act':>4}"]
+        for _, op, histogram, errors, in_flight in rows:
+            line = (
+                f"{op[:23]:<24}{histogram.count:>7}"
+                f"{histogram.percentile(50) * 1000:>8.1f}{histogram.percentile(99) * 1000:>8.1f}"
+                f"{histogram.max * 1000:>8.1f}{int(errors):>5}{int(in_flight):>4}"
+            )
+            if sum(len(row) + 1 for row in lines) + len(line) > 1900:
+                break
+            lines.append(line)
+        embed.description = "```\n" + "\n".join(lines) + "\n```"
+        embed.set_footer(text="Tiempos en ms, de más a menos tiempo total.")
+        await ctx.send(embed=embed)
+
+    @debug.command(name="trace")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_trace(self, ctx, id_mensaje: int):
+        """
+        Muestra cuánto tardó cada etapa de un mensaje reenviado recientemente.
+
+        Acepta el ID del mensaje original, el del mensaje reenviado o el del
+        canal de un ticket cerrado.
+        """
+        trace = self.bot.tracer.get(id_mensaje)
+        if trace is None:
+            embed = discord.Embed(
+                color=self.bot.error_color,
+                description=f"No hay ninguna traza reciente de `{id_mensaje}`.",
+            )
+            return await ctx.send(embed=embed)
+
+        lines = []
+        for span in sorted(trace.spans, key=lambda s: s.start):
+            line = (
+                f"{span.start * 1000:>8.1f} {span.duration * 1000:>8.1f}  "
+                f"{'  ' * span.depth}{span.name}{' ✗ ' + span.error if span.error else ''}"
+            )
+            if sum(len(row) + 1 for row in lines) + len(line) > 1800:
+                lines.append("...")
+                break
+            lines.append(line)
+
+        duration = "en curso" if trace.duration is None else f"{trace.duration * 1000:.1f} ms"
+        embed = discord.Embed(
+            title=f"Traza {trace.trace_id}",
+            color=self.bot.error_color if trace.error else self.bot.main_color,
+            description="```\n"
+            + f"{'inicio':>8} {'ms':>8}  etapa\n"
+            + "\n".join(lines or ["(sin etapas)"])
+            + "\n```",
+        )
+        embed.add_field(name="Operación", value=trace.name)
+        embed.add_field(name="Duración", value=duration)
+        if trace.error:
+            embed.add_field(name="Error", value=trace.error)
+        embed.set_footer(text="Tiempos en ms desde el inicio de la traza.")
+        embed.timestamp = trace.started_at
+        await ctx.send(embed=embed)
+
     @commands.command(aliases=["presence"])
     @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
     async def activity(self, ctx, tipo_actividad: str.lower, *, mensaje: str = ""):
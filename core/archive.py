@@ -0,0 +1,162 @@
+import asyncio
+import json
+import re
+import typing
+import zlib
+from datetime import datetime
+
+import isodate
+from discord.ext import tasks
+
+from core.models import getLogger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = [
+    "LogArchiver",
+    "PREVIEW_MESSAGES",
+    "WORD_PATTERN",
+    "compress_messages",
+    "decompress_messages",
+    "search_terms",
+]
+
+logger = getLogger(__name__)
+
+# Messages kept in the stub left in the logs collection
+PREVIEW_MESSAGES = 5
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def compress_messages(messages: typing.List[dict]) -> typing.Tuple[str, bytes]:
+    """
+    Compresses the messages of a log, with zstd if it's installed and zlib otherwise.
+
+    Returns
+    -------
+    Tuple[str, bytes]
+        The codec used and the compressed messages.
+    """
+    data = json.dumps(messages, separators=(",", ":")).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def decompress_messages(codec: str, data: bytes) -> typing.List[dict]:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is needed to read this archived log.")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        data = zlib.decompress(data)
+    else:
+        raise ValueError(f"Unknown codec {codec}.")
+    return json.loads(data.decode("utf-8"))
+
+
+def search_terms(log: dict) -> str:
+    """The distinct words of a log's messages, what archived logs are searched by."""
+    words = {log["key"]}
+    for message in log.get("messages") or ():
+        words.update(WORD_PATTERN.findall((message.get("content") or "").lower()))
+        words.update(WORD_PATTERN.findall((message.get("author") or {}).get("name", "").lower()))
+    return " ".join(sorted(words))
+
+
+class LogArchiver:
+    """
+    Background task that moves closed logs older than `archive_logs_after` out of
+    the logs collection, so it and its indexes stop growing with the bot's age.
+
+    The messages of an archived log are compressed into the `archived_logs`
+    collection. A stub is left in its place with everything but the messages and
+    a preview of the first few, so listing and looking up logs keeps working and
+    only reads the archive when the full log is needed.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    batch_size : int
+        The number of logs archived per database query.
+    interval : float
+        The time between two passes, in hours.
+    """
+
+    def __init__(self, bot, *, batch_size: int = 100, interval: float = 6):
+        self.bot = bot
+        self.batch_size = batch_size
+        self.interval = interval
+        self.last_run = None
+        self.task = None
+
+    def start(self) -> None:
+        """Starts the archival loop, does nothing if it's already running."""
+        if self.task is not None:
+            return
+        self.task = tasks.Loop(
+            self.archive,
+            seconds=0,
+            minutes=0,
+            hours=self.interval,
+            count=None,
+            reconnect=True,
+            loop=None,
+        )
+        self.task.before_loop(self.bot.wait_for_connected)
+        self.task.start()
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def archive(self) -> int:
+        """
+        Archives every log that is old enough, returns how many were. Errors are
+        logged so the archival loop keeps running.
+        """
+        try:
+            return await self._archive()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.error("Failed to archive logs.", exc_info=True)
+            return 0
+
+    async def _archive(self) -> int:
+        age = self.bot.config.get("archive_logs_after")
+        if age == isodate.Duration():
+            return 0
+        cutoff = str(datetime.utcnow() - age)
+
+        count = 0
+        while True:
+            logs = await self.bot.api.get_archivable_logs(cutoff, self.batch_size)
+            failed = False
+            for log in logs:
+                try:
+                    codec, data = await self.bot.loop.run_in_executor(
+                        None, compress_messages, log["messages"]
+                    )
+                    terms = await self.bot.loop.run_in_executor(None, search_terms, log)
+                    await self.bot.api.archive_log(log, codec, data, terms)
+                except Exception:
+                    # It would come back in the next batch, try again next pass
+                    logger.error("Failed to archive log %s.", log["key"], exc_info=True)
+                    failed = True
+                    continue
+                count += 1
+            if failed or len(logs) < self.batch_size:
+                break
+
+        self.last_run = datetime.utcnow()
+        if count:
+            logger.info("Archived %d logs closed before %s.", count, cutoff)
+        self.bot.metrics.counter("logs_archived_total").inc(count)
+        return count
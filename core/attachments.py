@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import typing
+
+import aiohttp
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AttachmentStore:
+    """
+    Where mirrored attachments are kept, addressed by the SHA-256 of their content.
+
+    Subclass this to keep attachments somewhere other than the local disk.
+    """
+
+    async def exists(self, key: str) -> bool:
+        return NotImplemented
+
+    async def open(self) -> typing.Any:
+        """Starts a new upload, the returned handle is passed to `write`, `commit` and `abort`."""
+        return NotImplemented
+
+    async def write(self, handle: typing.Any, chunk: bytes) -> None:
+        return NotImplemented
+
+    async def commit(self, handle: typing.Any, key: str) -> None:
+        """Stores the upload under `key`, replacing nothing if `key` already exists."""
+        return NotImplemented
+
+    async def abort(self, handle: typing.Any) -> None:
+        return NotImplemented
+
+    def url(self, key: str) -> str:
+        return NotImplemented
+
+
+class LocalAttachmentStore(AttachmentStore):
+    """
+    Keeps attachments in a directory, as `<root>/<key[:2]>/<key>`.
+
+    Parameters
+    ----------
+    root : str
+        The directory to store attachments in.
+    base_url : str
+        The URL the directory is served from.
+    loop : asyncio.AbstractEventLoop
+        The loop whose executor runs the file operations.
+    """
+
+    def __init__(self, root: str, base_url: str, *, loop: asyncio.AbstractEventLoop):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        self.loop = loop
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    async def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    async def open(self) -> typing.Any:
+        path = os.path.join(self.root, "tmp", secrets.token_hex(8))
+        return await self.loop.run_in_executor(None, open, path, "wb")
+
+    async def write(self, handle: typing.Any, chunk: bytes) -> None:
+        await self.loop.run_in_executor(None, handle.write, chunk)
+
+    async def commit(self, handle: typing.Any, key: str) -> None:
+        def commit():
+            handle.close()
+            path = self.path(key)
+            if os.path.exists(path):
+                os.remove(handle.name)
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(handle.name, path)
+
+        await self.loop.run_in_executor(None, commit)
+
+    async def abort(self, handle: typing.Any) -> None:
+        def abort():
+            handle.close()
+            os.remove(handle.name)
+
+        await self.loop.run_in_executor(None, abort)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key[:2]}/{key}"
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+
+class AttachmentMirror:
+    """
+    Copies attachments of logged messages to an `AttachmentStore` in the background
+    and points their log entries at the copy, since Discord attachment URLs of DM
+    messages eventually stop working.
+
+    Downloads are streamed in chunks and hashed on the way, a file that is already
+    stored isn't stored again. Enabled with the `attachment_mirror` config, and
+    only runs if something serves the copies: `attachment_mirror_url` is set or
+    the log viewer is on. The Discord URL is kept as `original_url`.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    store : AttachmentStore, optional
+        Where attachments are kept, a `LocalAttachmentStore` under `temp/attachments`
+        (or `attachment_mirror_path`) by default.
+    concurrency : int
+        The maximum number of downloads at once.
+    retries : int
+        How many times a failed download is retried.
+    """
+
+    def __init__(
+        self, bot, store: AttachmentStore = None, *, concurrency: int = 4, retries: int = 3,
+    ):
+        self.bot = bot
+        self._store = store
+        self.retries = retries
+        self.queue = asyncio.Queue()
+        self.concurrency = concurrency
+        self.workers = []
+        self._warned = False
+
+    @property
+    def enabled(self) -> bool:
+        if not self.bot.config.get("attachment_mirror"):
+            return False
+        return self._store is not None or self.base_url is not None
+
+    @property
+    def base_url(self) -> typing.Optional[str]:
+        """The URL the local store is served from, `None` if nothing serves it."""
+        base_url = self.bot.config["attachment_mirror_url"]
+        if base_url is None and self.bot.log_viewer.enabled:
+            base_url = self.bot.config["log_url"].strip("/") + "/attachments"
+        return base_url
+
+    @property
+    def max_size(self) -> int:
+        return self.bot.config.get("attachment_mirror_max_size")
+
+    @property
+    def store(self) -> AttachmentStore:
+        if self._store is None:
+            root = self.bot.config["attachment_mirror_path"] or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp", "attachments"
+            )
+            self._store = LocalAttachmentStore(root, self.base_url, loop=self.bot.loop)
+        return self._store
+
+    def start(self) -> None:
+        """Starts the download workers, does nothing if they're running or mirroring is off."""
+        if self.workers:
+            return
+        if not self.enabled:
+            if self.bot.config.get("attachment_mirror") and not self._warned:
+                # Links to the copies would be dead, keep the Discord ones instead
+                logger.warning(
+                    "Not mirroring attachments, set ATTACHMENT_MIRROR_URL or enable the log "
+                    "viewer to serve them."
+                )
+                self._warned = True
+            return
+        self.workers = [self.bot.loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    def schedule(
+        self, channel_id: str, message_id: str, attachments: typing.Iterable[dict]
+    ) -> None:
+        """Queues the attachments of a logged message, as stored in its log, returns right away."""
+        self.start()
+        if not self.workers:
+            return
+        for attachment in attachments:
+            self.queue.put_nowait(
+                (str(channel_id), str(message_id), attachment["id"], attachment["url"])
+            )
+        self.bot.metrics.gauge("attachment_mirror_queue").set(self.queue.qsize())
+
+    async def _work(self) -> None:
+        while True:
+            channel_id, message_id, attachment_id, url = await self.queue.get()
+            try:
+                await self.mirror(channel_id, message_id, attachment_id, url)
+            except Exception:
+                logger.error("Failed to mirror attachment %s.", url, exc_info=True)
+            finally:
+                self.queue.task_done()
+                self.bot.metrics.gauge("attachment_mirror_queue").set(self.queue.qsize())
+
+    async def mirror(self, channel_id: str, message_id: str, attachment_id: int, url: str) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                key = await self._download(url)
+            except AttachmentTooLarge:
+                logger.debug("Not mirroring %s, it's larger than %d bytes.", url, self.max_size)
+                self.bot.metrics.counter("attachments_mirrored_total", result="too_large").inc()
+                return
+            except aiohttp.ClientResponseError as e:
+                if e.status < 500 and e.status != 429:
+                    logger.warning("Failed to download attachment %s: %s.", url, e)
+                    self.bot.metrics.counter("attachments_mirrored_total", result="failed").inc()
+                    return
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                break
+
+            if attempt < self.retries:
+                delay = 2 ** attempt
+                logger.debug("Retrying download of %s in %ds: %s.", url, delay, error)
+                await asyncio.sleep(delay)
+        else:
+            logger.warning("Gave up downloading attachment %s: %s.", url, error)
+            self.bot.metrics.counter("attachments_mirrored_total", result="failed").inc()
+            return
+
+        await self.bot.api.update_attachment_url(
+            channel_id, message_id, attachment_id, self.store.url(key), original_url=url
+        )
+        self.bot.metrics.counter("attachments_mirrored_total", result="ok").inc()
+
+    async def _download(self, url: str) -> str:
+        store = self.store
+        max_size = self.max_size
+        timeout = aiohttp.ClientTimeout(total=300, sock_read=30)
+
+        async with self.bot.session.get(url, timeout=timeout, raise_for_status=True) as resp:
+            if resp.content_length is not None and resp.content_length > max_size:
+                raise AttachmentTooLarge
+
+            handle = await store.open()
+            try:
+                digest = hashlib.sha256()
+                size = 0
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise AttachmentTooLarge
+                    digest.update(chunk)
+                    await store.write(handle, chunk)
+            except BaseException:
+                await store.abort(handle)
+                raise
+
+        key = digest.hexdigest()
+        ext = os.path.splitext(url.split("?")[0])[1][:10]
+        key += ext.lower()
+        if await store.exists(key):
+            await store.abort(handle)
+            self.bot.metrics.counter("attachments_deduplicated_total").inc()
+        else:
+            await store.commit(handle, key)
+            self.bot.metrics.counter("attachment_mirror_bytes_total").inc(size)
+        return key
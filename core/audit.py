@@ -0,0 +1,115 @@
+import asyncio
+import typing
+
+import discord
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class AuditLogWatcher:
+    """
+    Shared, coalescing cache of recent audit log entries for the Modmail guild.
+
+    Lookups made for an event are answered from the last fetch if that fetch started
+    after the event was observed, otherwise a new fetch is made. Concurrent lookups
+    for the same action share a single in-flight request.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    limit : int
+        How many entries to request per fetch.
+    window : float
+        How long, in seconds, an entry is kept after it was last seen.
+
+    Attributes
+    ----------
+    fetches : int
+        The number of audit log requests made.
+    lookups : int
+        The number of lookups served, including the ones that made a request.
+    """
+
+    def __init__(self, bot, *, limit: int = 10, window: float = 120):
+        self.bot = bot
+        self.limit = limit
+        self.window = window
+        self.fetches = 0
+        self.lookups = 0
+        self._entries = {}
+        self._fetched_at = {}
+        self._pending = {}
+
+    def now(self) -> float:
+        return self.bot.loop.time()
+
+    async def find(
+        self,
+        action: discord.AuditLogAction,
+        predicate: typing.Callable[[discord.AuditLogEntry], bool],
+        *,
+        since: float = None,
+    ) -> typing.Optional[discord.AuditLogEntry]:
+        """
+        Finds the most recent entry of `action` matching `predicate`.
+
+        Parameters
+        ----------
+        action : AuditLogAction
+            The audit log action to look for.
+        predicate : Callable[[AuditLogEntry], bool]
+            The check an entry needs to pass.
+        since : float, optional
+            The loop time at which the event was observed, entries fetched before
+            this point are not trusted to contain it. Defaults to now.
+
+        Returns
+        -------
+        Optional[AuditLogEntry]
+            The matching entry, or `None` if it cannot be found.
+        """
+        if since is None:
+            since = self.now()
+        self.lookups += 1
+
+        while self._fetched_at.get(action, float("-inf")) < since:
+            pending = self._pending.get(action)
+            if pending is None:
+                task = self.bot.loop.create_task(self._fetch(action, self.now()))
+                pending = self._pending[action] = task
+            try:
+                await asyncio.shield(pending)
+            except discord.HTTPException as e:
+                logger.warning("Failed to retrieve audit logs for %s: %s.", action, e)
+                return None
+
+        entries = (entry for entry, _ in self._entries.get(action, {}).values())
+        return next(
+            (
+                entry
+                for entry in sorted(entries, key=lambda e: e.id, reverse=True)
+                if predicate(entry)
+            ),
+            None,
+        )
+
+    async def _fetch(self, action: discord.AuditLogAction, started: float) -> None:
+        try:
+            self.fetches += 1
+            fetched = await self.bot.modmail_guild.audit_logs(
+                limit=self.limit, action=action
+            ).flatten()
+
+            entries = self._entries.setdefault(action, {})
+            for entry in fetched:
+                entries[entry.id] = (entry, started)
+            # Entries that stopped showing up eventually fall out of the window
+            for entry_id, (_, seen) in tuple(entries.items()):
+                if started - seen > self.window:
+                    del entries[entry_id]
+            self._fetched_at[action] = max(self._fetched_at.get(action, started), started)
+        finally:
+            self._pending.pop(action, None)
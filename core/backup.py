@@ -0,0 +1,354 @@
+"""
+Streams the logs collection to and from gzip compressed JSONL files.
+
+Also usable without running the bot::
+
+    python -m core.backup export logs.jsonl.gz --guild 1234 --since 2020-01-01
+    python -m core.backup import logs.jsonl.gz
+"""
+
+import argparse
+import asyncio
+import gzip
+import inspect
+import itertools
+import os
+import sys
+import typing
+from datetime import datetime
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from core.archive import decompress_messages
+from core.models import getLogger
+
+__all__ = ["LogFilter", "ImportResult", "export_logs", "import_logs"]
+
+logger = getLogger(__name__)
+
+BATCH_SIZE = 500
+DUPLICATE_KEY = 11000
+
+# Called with the number of logs done and the total, if it's known
+ProgressCallback = typing.Callable[[int, typing.Optional[int]], typing.Any]
+
+
+def _check_date(value: str) -> str:
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
+
+class LogFilter(typing.NamedTuple):
+    """
+    Which logs to export, every field is optional.
+
+    `since` and `until` are dates (`YYYY-MM-DD`) compared against when the log
+    was created, `until` is exclusive. `first_key` and `last_key` bound the log
+    keys, both inclusive.
+    """
+
+    guild_id: typing.Optional[str] = None
+    since: typing.Optional[str] = None
+    until: typing.Optional[str] = None
+    first_key: typing.Optional[str] = None
+    last_key: typing.Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str, guild_id: str = None) -> "LogFilter":
+        """
+        Parses filters written as `servidor=<ID|todos> desde=<fecha> hasta=<fecha>
+        claves=<primera>..<última>`.
+
+        Raises
+        ------
+        ValueError
+            If a filter is unknown or invalid.
+        """
+        fields = {"guild_id": guild_id}
+        for part in text.split():
+            name, sep, value = part.partition("=")
+            if not sep or not value:
+                raise ValueError(f"Filtro no válido: `{part}`.")
+            name = name.lower()
+            if name == "servidor":
+                fields["guild_id"] = None if value.lower() == "todos" else value
+            elif name in ("desde", "hasta"):
+                try:
+                    fields["since" if name == "desde" else "until"] = _check_date(value)
+                except ValueError:
+                    raise ValueError(f"Fecha no válida: `{value}`, usa AAAA-MM-DD.")
+            elif name == "claves":
+                first, _, last = value.partition("..")
+                fields["first_key"] = first or None
+                fields["last_key"] = last or None
+            else:
+                raise ValueError(f"Filtro desconocido: `{name}`.")
+        return cls(**fields)
+
+    def query(self) -> dict:
+        query = {}
+        if self.guild_id is not None:
+            query["guild_id"] = str(self.guild_id)
+        if self.since is not None or self.until is not None:
+            query["created_at"] = {}
+            if self.since is not None:
+                query["created_at"]["$gte"] = self.since
+            if self.until is not None:
+                query["created_at"]["$lt"] = self.until
+        if self.first_key is not None or self.last_key is not None:
+            query["_id"] = {}
+            if self.first_key is not None:
+                query["_id"]["$gte"] = self.first_key
+            if self.last_key is not None:
+                query["_id"]["$lte"] = self.last_key
+        return query
+
+
+def _skip_lines(fp: typing.IO[bytes], count: int) -> None:
+    for _ in itertools.islice(fp, count):
+        pass
+
+
+class ImportResult(typing.NamedTuple):
+    inserted: int
+    skipped: int
+
+
+async def _report(progress: typing.Optional[ProgressCallback], done: int, total: int) -> None:
+    if progress is not None:
+        result = progress(done, total)
+        if inspect.isawaitable(result):
+            await result
+
+
+async def _unarchive(archive, log: dict) -> None:
+    archived = await archive.find_one({"_id": log["_id"]})
+    if archived is None:
+        logger.warning("The archived messages of log %s are missing.", log["key"])
+        return
+    log["messages"] = await asyncio.get_event_loop().run_in_executor(
+        None, decompress_messages, archived["codec"], archived["messages"]
+    )
+    del log["archived"]
+    log.pop("message_count", None)
+
+
+async def export_logs(
+    collection,
+    path: str,
+    log_filter: LogFilter = LogFilter(),
+    *,
+    archive=None,
+    batch_size: int = BATCH_SIZE,
+    progress: ProgressCallback = None,
+) -> int:
+    """
+    Writes the logs matching `log_filter` to `path`, one JSON document per line.
+
+    Logs are read through a cursor in key order and written in batches, so
+    memory use doesn't grow with the number of logs. The file only appears
+    at `path` once it's complete.
+
+    Parameters
+    ----------
+    collection : AsyncIOMotorCollection
+        The logs collection.
+    path : str
+        The file to write.
+    log_filter : LogFilter
+        Which logs to export.
+    archive : AsyncIOMotorCollection, optional
+        The archived logs collection, archived logs are exported in full
+        when it's given.
+    batch_size : int
+        The number of logs read and written at once.
+    progress : Callable[[int, Optional[int]], Any]
+        Called after every batch, may be a coroutine function.
+
+    Returns
+    -------
+    int
+        The number of logs exported.
+    """
+    loop = asyncio.get_event_loop()
+    query = log_filter.query()
+    total = await collection.count_documents(query)
+    partial = path + ".part"
+
+    count = 0
+    out = await loop.run_in_executor(None, gzip.open, partial, "wb", 6)
+    try:
+        cursor = collection.find(query, sort=[("_id", 1)], batch_size=batch_size)
+        lines = []
+        async for log in cursor:
+            if archive is not None and log.get("archived"):
+                await _unarchive(archive, log)
+            line = json_util.dumps(log, json_options=json_util.RELAXED_JSON_OPTIONS)
+            lines.append(line.encode("utf-8") + b"\n")
+            if len(lines) >= batch_size:
+                await loop.run_in_executor(None, out.writelines, lines)
+                count += len(lines)
+                lines = []
+                await _report(progress, count, total)
+        if lines:
+            await loop.run_in_executor(None, out.writelines, lines)
+            count += len(lines)
+        await loop.run_in_executor(None, out.close)
+    except BaseException:
+        await loop.run_in_executor(None, out.close)
+        os.remove(partial)
+        raise
+
+    os.replace(partial, path)
+    await _report(progress, count, total)
+    logger.info("Exported %d logs to %s.", count, path)
+    return count
+
+
+async def import_logs(
+    collection,
+    path: str,
+    *,
+    batch_size: int = BATCH_SIZE,
+    progress: ProgressCallback = None,
+    resume: bool = True,
+) -> ImportResult:
+    """
+    Inserts the logs of a file written by `export_logs`.
+
+    Logs are inserted in batches with `insert_many`. Logs that already exist
+    are skipped, and the number of lines done is saved next to the file after
+    every batch, so an interrupted import picks up where it stopped when it's
+    run again.
+
+    Parameters
+    ----------
+    collection : AsyncIOMotorCollection
+        The logs collection.
+    path : str
+        The file to read.
+    batch_size : int
+        The number of logs read and inserted at once.
+    progress : Callable[[int, Optional[int]], Any]
+        Called after every batch, may be a coroutine function.
+    resume : bool
+        Whether to skip the lines a previous import of the file got through.
+
+    Returns
+    -------
+    ImportResult
+        The number of logs inserted and skipped because they already existed.
+    """
+    loop = asyncio.get_event_loop()
+    checkpoint = path + ".resume"
+
+    done = 0
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            done = int(f.read().strip() or 0)
+        logger.info("Resuming the import of %s after %d logs.", path, done)
+
+    def save_checkpoint(value):
+        with open(checkpoint, "w") as f:
+            f.write(str(value))
+
+    inserted = skipped = 0
+    fp = await loop.run_in_executor(None, gzip.open, path, "rb")
+    try:
+        if done:
+            await loop.run_in_executor(None, _skip_lines, fp, done)
+
+        while True:
+            lines = await loop.run_in_executor(
+                None, lambda: list(itertools.islice(fp, batch_size))
+            )
+            if not lines:
+                break
+            logs = [json_util.loads(line) for line in lines if line.strip()]
+            if logs:
+                try:
+                    result = await collection.insert_many(logs, ordered=False)
+                    inserted += len(result.inserted_ids)
+                except BulkWriteError as e:
+                    errors = e.details["writeErrors"]
+                    if any(error["code"] != DUPLICATE_KEY for error in errors):
+                        raise
+                    inserted += e.details["nInserted"]
+                    skipped += len(errors)
+            done += len(lines)
+            await loop.run_in_executor(None, save_checkpoint, done)
+            await _report(progress, done, None)
+    finally:
+        await loop.run_in_executor(None, fp.close)
+
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    logger.info("Imported %d logs from %s, skipped %d.", inserted, path, skipped)
+    return ImportResult(inserted, skipped)
+
+
+def main(argv: typing.List[str] = None) -> None:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        prog="python -m core.backup", description="Export or import the Modmail logs."
+    )
+    parser.add_argument(
+        "--uri",
+        default=os.environ.get("CONNECTION_URI") or os.environ.get("MONGO_URI"),
+        help="the MongoDB connection URI, CONNECTION_URI by default",
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write logs to a .jsonl.gz file")
+    export.add_argument("path")
+    export.add_argument("--guild", help="only logs of this guild ID")
+    export.add_argument("--since", type=_check_date, help="created on or after YYYY-MM-DD")
+    export.add_argument("--until", type=_check_date, help="created before YYYY-MM-DD")
+    export.add_argument("--first-key", help="the first log key to export")
+    export.add_argument("--last-key", help="the last log key to export")
+
+    import_ = commands.add_parser("import", help="insert the logs of a .jsonl.gz file")
+    import_.add_argument("path")
+    import_.add_argument(
+        "--no-resume", dest="resume", action="store_false", help="start over from the first log"
+    )
+
+    args = parser.parse_args(argv)
+    if args.uri is None:
+        parser.error("no connection URI, set CONNECTION_URI or pass --uri")
+    db = AsyncIOMotorClient(args.uri).modmail_bot
+    collection = db.logs
+
+    def progress(done, total):
+        print(f"\r{done}/{total}" if total is not None else f"\r{done}", end="", file=sys.stderr)
+
+    if args.command == "export":
+        log_filter = LogFilter(args.guild, args.since, args.until, args.first_key, args.last_key)
+        coro = export_logs(
+            collection,
+            args.path,
+            log_filter,
+            archive=db.archived_logs,
+            batch_size=args.batch_size,
+            progress=progress,
+        )
+    else:
+        coro = import_logs(
+            collection,
+            args.path,
+            batch_size=args.batch_size,
+            progress=progress,
+            resume=args.resume,
+        )
+    result = asyncio.get_event_loop().run_until_complete(coro)
+    print(file=sys.stderr)
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import asyncio
+import typing
+
+import discord
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class CategoryManager:
+    """
+    Hands out room for new thread channels across the main category and an
+    ordered list of overflow categories.
+
+    Channel counts are tracked from channel events, slots are reserved while a
+    channel is being created so concurrent threads can't overfill a category.
+    The next overflow category is created ahead of time once the last one is
+    close to full, and empty overflow categories are removed again.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    """
+
+    limit = 50
+    headroom = 5
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._channels = None
+        self._reserved = {}
+        self._lock = asyncio.Lock()
+        self._creating = None
+
+    def _ensure_counts(self) -> typing.Dict[int, typing.Set[int]]:
+        if self._channels is None:
+            self._channels = {}
+            for channel in self.bot.modmail_guild.channels:
+                if channel.category_id is not None:
+                    self._channels.setdefault(channel.category_id, set()).add(channel.id)
+        return self._channels
+
+    def used(self, category: discord.CategoryChannel) -> int:
+        """The number of channels in `category`, including reserved ones."""
+        counts = self._ensure_counts()
+        return len(counts.get(category.id, ())) + self._reserved.get(category.id, 0)
+
+    def free(self, category: discord.CategoryChannel) -> int:
+        """
+        The number of thread channels `category` still has room for. Pool channels
+        are in the main category, they count as room since threads take them over.
+        """
+        free = self.limit - self.used(category)
+        if category == self.bot.main_category:
+            free += self.bot.channel_pool.available
+        return free
+
+    @property
+    def overflow(self) -> typing.List[discord.CategoryChannel]:
+        """The overflow categories, in the order they are filled."""
+        guild = self.bot.modmail_guild
+        ids = [int(i) for i in self.bot.config["overflow_category_ids"]]
+
+        fallback_id = self.bot.config["fallback_category_id"]
+        if fallback_id:
+            try:
+                fallback_id = int(fallback_id)
+            except ValueError:
+                fallback_id = None
+            if fallback_id is not None and fallback_id not in ids:
+                ids.insert(0, fallback_id)
+
+        categories = []
+        main = self.bot.main_category
+        for category_id in ids:
+            category = guild.get_channel(category_id)
+            if isinstance(category, discord.CategoryChannel) and category != main:
+                categories.append(category)
+        return categories
+
+    async def allocate(self) -> typing.Optional[discord.CategoryChannel]:
+        """
+        Reserves a slot for a new thread channel.
+
+        The slot must be given back with `release` once the channel is created, or
+        creating it failed.
+
+        Returns
+        -------
+        Optional[CategoryChannel]
+            The category with room for the channel, `None` if there's no main category.
+        """
+        main = self.bot.main_category
+        if main is None:
+            return None
+
+        async with self._lock:
+            chain = [main, *self.overflow]
+            category = next((c for c in chain if self.free(c) > 0), None)
+            if category is None:
+                category = await self._create_overflow(main)
+            self._reserved[category.id] = self._reserved.get(category.id, 0) + 1
+
+            last = chain[-1] if category in chain else category
+            if self.free(last) <= self.headroom and self._creating is None:
+                # Make the next category before it's needed
+                self._creating = self.bot.loop.create_task(self._precreate(main))
+        return category
+
+    def release(
+        self, category: discord.CategoryChannel, channel: discord.abc.GuildChannel = None
+    ) -> None:
+        """Gives back a slot reserved with `allocate`, tracking `channel` if it was created."""
+        reserved = self._reserved.get(category.id, 0)
+        if reserved <= 1:
+            self._reserved.pop(category.id, None)
+        else:
+            self._reserved[category.id] = reserved - 1
+        if channel is not None:
+            self._ensure_counts().setdefault(category.id, set()).add(channel.id)
+
+    async def _precreate(self, main: discord.CategoryChannel) -> None:
+        try:
+            async with self._lock:
+                if all(self.free(c) <= self.headroom for c in [main, *self.overflow]):
+                    await self._create_overflow(main)
+        except discord.HTTPException:
+            logger.warning("Failed to create an overflow category.", exc_info=True)
+        finally:
+            self._creating = None
+
+    async def _create_overflow(self, main: discord.CategoryChannel) -> discord.CategoryChannel:
+        category = await main.clone(name="Fallback RequiemSupport")
+        self._ensure_counts().setdefault(category.id, set())
+        self.bot.config["overflow_category_ids"].append(str(category.id))
+        await self.bot.config.update()
+        logger.info("Created overflow category %s.", category.id)
+        return category
+
+    async def _cleanup(self, category_id: int) -> None:
+        async with self._lock:
+            overflow = self.overflow
+            category = next((c for c in overflow if c.id == category_id), None)
+            if category is None or self.used(category):
+                return
+            if str(category.id) not in self.bot.config["overflow_category_ids"]:
+                # Only remove categories the bot made itself
+                return
+            others = [self.bot.main_category, *(c for c in overflow if c != category)]
+            if all(self.free(c) <= self.headroom for c in others if c):
+                # Still need it as the spare
+                return
+            try:
+                await category.delete(reason="Overflow category is no longer needed.")
+            except discord.HTTPException:
+                logger.warning("Failed to delete overflow category %s.", category.id)
+                return
+        logger.info("Deleted empty overflow category %s.", category_id)
+
+    def _remove(self, channel: discord.abc.GuildChannel, category_id: typing.Optional[int]):
+        if category_id is None or self._channels is None:
+            return
+        channels = self._channels.get(category_id)
+        if channels is None:
+            return
+        channels.discard(channel.id)
+        if not channels:
+            self.bot.loop.create_task(self._cleanup(category_id))
+
+    def on_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        if self._channels is not None and channel.category_id is not None:
+            self._channels.setdefault(channel.category_id, set()).add(channel.id)
+
+    def on_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ) -> None:
+        if before.category_id != after.category_id:
+            self._remove(before, before.category_id)
+            self.on_channel_create(after)
+
+    def on_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        if isinstance(channel, discord.CategoryChannel):
+            if self._channels is not None:
+                self._channels.pop(channel.id, None)
+            ids = self.bot.config["overflow_category_ids"]
+            if str(channel.id) in ids:
+                ids.remove(str(channel.id))
+                self.bot.loop.create_task(self.bot.config.update())
+            return
+        self._remove(channel, channel.category_id)
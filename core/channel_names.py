@@ -0,0 +1,131 @@
+import typing
+
+import discord
+
+from core.utils import channel_base_name
+
+
+class ChannelNameIndex:
+    """
+    Keeps track of the text channel names in the Modmail guild so a free thread
+    channel name can be picked without scanning every channel.
+
+    Names are counted from channel events. A name handed out by `reserve` stays
+    taken until it's released, so threads created at the same time for users
+    with the same name never end up with the same channel name.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._names = None
+        self._counts = {}
+        self._reserved = set()
+        self._next = {}
+
+    def _ensure_index(self) -> typing.Dict[int, str]:
+        if self._names is None:
+            self._names = {}
+            for channel in self.bot.modmail_guild.channels:
+                if isinstance(channel, discord.TextChannel):
+                    self._add(channel)
+        return self._names
+
+    def _add(self, channel: discord.TextChannel, name: str = None) -> None:
+        name = name or channel.name
+        old = self._names.get(channel.id)
+        if old == name:
+            return
+        if old is not None:
+            self._discard(channel.id)
+        self._names[channel.id] = name
+        self._counts[name] = self._counts.get(name, 0) + 1
+
+    def _discard(self, channel_id: int) -> None:
+        name = self._names.pop(channel_id, None)
+        if name is None:
+            return
+        count = self._counts.get(name, 0) - 1
+        if count > 0:
+            self._counts[name] = count
+            return
+        self._counts.pop(name, None)
+        self._free(name)
+
+    def _free(self, name: str) -> None:
+        # Let the next reservation reuse the freed suffix
+        base, _, suffix = name.rpartition("_")
+        if suffix.isdigit() and base in self._next:
+            self._next[base] = min(self._next[base], int(suffix))
+
+    def taken(self, name: str, exclude_channel: discord.abc.GuildChannel = None) -> bool:
+        """Whether a text channel called `name` exists or is about to be created."""
+        if name in self._reserved:
+            return True
+        count = self._counts.get(name, 0)
+        if exclude_channel is not None and self._ensure_index().get(exclude_channel.id) == name:
+            count -= 1
+        return count > 0
+
+    def reserve(self, author, exclude_channel: discord.abc.GuildChannel = None) -> str:
+        """
+        Picks a free channel name for `author` and holds on to it.
+
+        The name must be given back with `release` once the channel is created or
+        renamed, or that failed.
+
+        Parameters
+        ----------
+        author : User
+            The user the channel is for.
+        exclude_channel : GuildChannel, optional
+            A channel whose current name doesn't count as taken, used when a
+            channel gets renamed.
+
+        Returns
+        -------
+        str
+            The channel name, `username-1234` or `username-1234_<n>` on collision.
+        """
+        self._ensure_index()
+        base = channel_base_name(author)
+        name = base
+        if self.taken(name, exclude_channel):
+            counter = self._next.get(base, 1)
+            while self.taken(f"{base}_{counter}", exclude_channel):
+                counter += 1
+            self._next[base] = counter + 1
+            name = f"{base}_{counter}"
+        self._reserved.add(name)
+        return name
+
+    def release(self, name: str, channel: discord.TextChannel = None) -> None:
+        """
+        Gives back a name from `reserve`, tracking `channel` under it if it was
+        created or renamed. `channel.edit` doesn't update the object, so the
+        reserved name is used rather than the channel's.
+        """
+        self._reserved.discard(name)
+        if channel is not None:
+            self._ensure_index()
+            self._add(channel, name)
+        elif not self._counts.get(name):
+            self._free(name)
+
+    def on_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        if self._names is not None and isinstance(channel, discord.TextChannel):
+            self._add(channel)
+
+    def on_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ) -> None:
+        if before.name != after.name:
+            self.on_channel_create(after)
+
+    def on_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        if self._names is not None:
+            self._discard(channel.id)
@@ -1,24 +1,64 @@
+import asyncio
+import functools
+import inspect
 import secrets
 import sys
+import time
 from datetime import datetime
 from json import JSONDecodeError
-from typing import Union, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 from discord import Member, DMChannel, TextChannel, Message
 
 from aiohttp import ClientResponseError, ClientResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 from pymongo.errors import ConfigurationError
 
+from core.archive import PREVIEW_MESSAGES, WORD_PATTERN, decompress_messages
 from core.models import getLogger
+from core.stats import REPLY_TYPES
 
 logger = getLogger(__name__)
 
 
+def _timed(op: str, func):
+    """Wraps a database operation to record its latency, errors and concurrency."""
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        metrics = self.bot.metrics
+        in_flight = metrics.gauge("db_operations_in_flight", op=op)
+        in_flight.inc()
+        started = time.perf_counter()
+        finished = True
+        try:
+            return await func(self, *args, **kwargs)
+        except asyncio.CancelledError:
+            # It didn't finish, its time says nothing about the database
+            finished = False
+            raise
+        except Exception as e:
+            metrics.counter("db_operation_errors_total", op=op, error=type(e).__name__).inc()
+            raise
+        finally:
+            in_flight.dec()
+            if finished:
+                metrics.histogram("db_operation_seconds", op=op).record(
+                    time.perf_counter() - started
+                )
+
+    return wrapper
+
+
 class ApiClient:
     """
     This class represents the general request class for all type of clients.
 
+    The public coroutines of subclasses are timed, their latency, errors and
+    number in flight are recorded in the `db_operation_seconds`,
+    `db_operation_errors_total` and `db_operations_in_flight` metrics.
+
     Parameters
     ----------
     bot : Bot
@@ -28,15 +68,27 @@ class ApiClient:
     ----------
     bot : Bot
         The Modmail bot.
+    db
+        The database relaying reads and writes go to.
+    analytics_db
+        The database browsing and analytics queries read from, `db` by default.
     session : ClientSession
         The bot's current running `ClientSession`.
     """
 
-    def __init__(self, bot, db):
+    def __init__(self, bot, db, analytics_db=None):
         self.bot = bot
         self.db = db
+        self.analytics_db = analytics_db if analytics_db is not None else db
         self.session = bot.session
 
+    def __init_subclass__(cls, **kwargs):
+        # Every public coroutine of a client is a database operation, time them all
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(value):
+                setattr(cls, name, _timed(name, value))
+
     async def request(
         self,
         url: str,
@@ -82,27 +134,49 @@ class ApiClient:
     def logs(self):
         return self.db.logs
 
+    @property
+    def analytics_logs(self):
+        """The logs collection for queries that may read slightly stale data."""
+        return self.analytics_db.logs
+
     async def setup_indexes(self):
         return NotImplemented
 
     async def validate_database_connection(self):
         return NotImplemented
 
+    async def ping(self):
+        return NotImplemented
+
     async def get_user_logs(self, user_id: Union[str, int]) -> list:
         return NotImplemented
 
     async def get_latest_user_logs(self, user_id: Union[str, int]):
         return NotImplemented
 
-    async def get_responded_logs(self, user_id: Union[str, int]) -> list:
+    async def get_responded_logs(
+        self, user_id: Union[str, int], *, limit: int = 10, before: str = None
+    ) -> list:
         return NotImplemented
 
-    async def get_open_logs(self) -> list:
+    async def backfill_responders(self) -> int:
+        return NotImplemented
+
+    async def get_open_logs(self, projection: dict = None) -> list:
         return NotImplemented
 
     async def get_log(self, channel_id: Union[str, int]) -> dict:
         return NotImplemented
 
+    async def get_log_by_key(self, key: str) -> Optional[dict]:
+        return NotImplemented
+
+    async def save_transcript(self, transcript) -> None:
+        return NotImplemented
+
+    async def get_transcript(self, key: str) -> Optional[dict]:
+        return NotImplemented
+
     async def get_log_link(self, channel_id: Union[str, int]) -> str:
         return NotImplemented
 
@@ -114,6 +188,15 @@ class ApiClient:
     async def delete_log_entry(self, key: str) -> bool:
         return NotImplemented
 
+    async def get_archivable_logs(self, closed_before: str, limit: int) -> list:
+        return NotImplemented
+
+    async def archive_log(self, log: dict, codec: str, data: bytes, terms: str) -> None:
+        return NotImplemented
+
+    async def close_logs(self, channel_ids: List[Union[int, str]], data: dict) -> int:
+        return NotImplemented
+
     async def get_config(self) -> dict:
         return NotImplemented
 
@@ -130,15 +213,30 @@ class ApiClient:
         message_id: str = "",
         channel_id: str = "",
         type_: str = "thread_message",
+        groups: Dict[str, int] = None,
     ) -> dict:
         return NotImplemented
 
+    async def update_attachment_url(
+        self, channel_id: str, message_id: str, attachment_id: int, url: str, *, original_url: str
+    ) -> None:
+        return NotImplemented
+
     async def post_log(self, channel_id: Union[int, str], data: dict) -> dict:
         return NotImplemented
 
+    async def apply_journal_entry(self, op: str, args: dict) -> None:
+        return NotImplemented
+
     async def search_closed_by(self, user_id: Union[int, str]):
         return NotImplemented
 
+    async def update_stats(self, day: str, updates: List[Tuple[str, str, dict]]) -> None:
+        return NotImplemented
+
+    async def get_stats(self, since: str) -> list:
+        return NotImplemented
+
     async def search_by_text(self, text: str, limit: Optional[int]):
         return NotImplemented
 
@@ -161,7 +259,7 @@ class MongoDBClient(ApiClient):
                 raise RuntimeError
 
         try:
-            db = AsyncIOMotorClient(mongo_uri).modmail_bot
+            db = AsyncIOMotorClient(mongo_uri, **self._client_options(bot)).modmail_bot
         except ConfigurationError as e:
             logger.critical(
                 "Your MONGO_URI might be copied wrong, try re-copying from the source again. "
@@ -170,7 +268,43 @@ class MongoDBClient(ApiClient):
             logger.critical(e)
             sys.exit(0)
 
-        super().__init__(bot, db)
+        # Browsing and analytics get their own pool, so long reads never hold up relaying
+        analytics_uri = bot.config["analytics_uri"] or mongo_uri
+        try:
+            analytics_db = AsyncIOMotorClient(
+                analytics_uri, **self._analytics_options(bot)
+            ).modmail_bot
+        except (ConfigurationError, ValueError) as e:
+            logger.error("Invalid analytics database settings, using the main connection: %s", e)
+            analytics_db = db
+
+        super().__init__(bot, db, analytics_db)
+
+    @staticmethod
+    def _client_options(bot) -> dict:
+        options = {
+            "maxPoolSize": bot.config.get("db_max_pool_size"),
+            "minPoolSize": bot.config.get("db_min_pool_size"),
+            "serverSelectionTimeoutMS": bot.config.get("db_timeout") * 1000,
+            "connectTimeoutMS": bot.config.get("db_timeout") * 1000,
+        }
+        if bot.config.get("db_socket_timeout"):
+            options["socketTimeoutMS"] = bot.config.get("db_socket_timeout") * 1000
+        if bot.config["db_compressors"]:
+            options["compressors"] = bot.config["db_compressors"]
+        return options
+
+    @staticmethod
+    def _analytics_options(bot) -> dict:
+        options = {
+            "maxPoolSize": bot.config.get("analytics_max_pool_size"),
+            "readPreference": bot.config["analytics_read_preference"],
+            "serverSelectionTimeoutMS": bot.config.get("db_timeout") * 1000,
+            "connectTimeoutMS": bot.config.get("db_timeout") * 1000,
+        }
+        if bot.config["db_compressors"]:
+            options["compressors"] = bot.config["db_compressors"]
+        return options
 
     async def setup_indexes(self):
         """Setup text indexes so we can use the $search operator"""
@@ -191,7 +325,19 @@ class MongoDBClient(ApiClient):
             await coll.create_index(
                 [("messages.content", "text"), ("messages.author.name", "text"), ("key", "text")]
             )
+        await self.db.stats.create_index([("guild_id", 1), ("day", 1)])
+        await coll.create_index([("guild_id", 1), ("responders", 1), ("closed_at", -1)])
+        await coll.create_index([("guild_id", 1), ("open", 1), ("closed_at", 1)])
+        await self.db.archived_logs.create_index([("guild_id", 1), ("terms", "text")])
         logger.debug("Successfully configured and verified database indexes.")
+        self.bot.loop.create_task(self._backfill_responders())
+
+    async def _backfill_responders(self) -> None:
+        # Runs in the background, it reads every log created before responders were kept
+        try:
+            await self.backfill_responders()
+        except Exception:
+            logger.error("Failed to fill in the responders of old logs.", exc_info=True)
 
     async def validate_database_connection(self):
         try:
@@ -224,12 +370,16 @@ class MongoDBClient(ApiClient):
             logger.debug("Successfully connected to the database.")
         logger.line("debug")
 
+    async def ping(self):
+        """A lightweight round trip to check the database is still reachable"""
+        await self.db.command("ping")
+
     async def get_user_logs(self, user_id: Union[str, int]) -> list:
         query = {"recipient.id": str(user_id), "guild_id": str(self.bot.guild_id)}
         projection = {"messages": {"$slice": 5}}
         logger.debug("Retrieving user %s logs.", user_id)
 
-        return await self.logs.find(query, projection).to_list(None)
+        return await self.analytics_logs.find(query, projection).to_list(None)
 
     async def get_latest_user_logs(self, user_id: Union[str, int]):
         query = {"recipient.id": str(user_id), "guild_id": str(self.bot.guild_id), "open": False}
@@ -238,26 +388,145 @@ class MongoDBClient(ApiClient):
 
         return await self.logs.find_one(query, projection, limit=1, sort=[("closed_at", -1)])
 
-    async def get_responded_logs(self, user_id: Union[str, int]) -> list:
-        query = {
-            "open": False,
-            "messages": {
-                "$elemMatch": {
-                    "author.id": str(user_id),
-                    "author.mod": True,
-                    "type": {"$in": ["anonymous", "thread_message"]},
-                }
-            },
-        }
-        return await self.logs.find(query).to_list(None)
+    async def get_responded_logs(
+        self, user_id: Union[str, int], *, limit: int = 10, before: str = None
+    ) -> list:
+        """
+        A page of the closed logs `user_id` replied in, most recently closed first.
 
-    async def get_open_logs(self) -> list:
+        Pass the `closed_at` of the last log of a page as `before` to get the next one.
+        """
+        query = {"guild_id": str(self.bot.guild_id), "responders": str(user_id), "open": False}
+        if before is not None:
+            query["closed_at"] = {"$lt": before}
+        return await self.analytics_logs.find(
+            query, {"messages": {"$slice": 5}}, sort=[("closed_at", -1)], limit=limit
+        ).to_list(None)
+
+    async def backfill_responders(self) -> int:
+        """Fills in `responders` for logs created before it was kept, returns how many."""
+        count = 0
+        requests = []
+        cursor = self.analytics_logs.find(
+            {"responders": {"$exists": False}},
+            {"messages.author.id": 1, "messages.author.mod": 1, "messages.type": 1},
+        )
+        async for log in cursor:
+            responders = list(
+                {
+                    m["author"]["id"]
+                    for m in log.get("messages") or ()
+                    if m.get("author", {}).get("mod") and m.get("type") in REPLY_TYPES
+                }
+            )
+            # $addToSet, so replies appended meanwhile aren't lost
+            requests.append(
+                UpdateOne(
+                    {"_id": log["_id"]}, {"$addToSet": {"responders": {"$each": responders}}}
+                )
+            )
+            if len(requests) >= 500:
+                count += (await self.logs.bulk_write(requests, ordered=False)).modified_count
+                requests = []
+        if requests:
+            count += (await self.logs.bulk_write(requests, ordered=False)).modified_count
+        if count:
+            logger.info("Filled in the responders of %d logs.", count)
+        return count
+
+    async def get_open_logs(self, projection: dict = None) -> list:
         query = {"open": True}
-        return await self.logs.find(query).to_list(None)
+        return await self.analytics_logs.find(query, projection).to_list(None)
 
     async def get_log(self, channel_id: Union[str, int]) -> dict:
         logger.debug("Retrieving channel %s logs.", channel_id)
-        return await self.logs.find_one({"channel_id": str(channel_id)})
+        return await self._unarchive(await self.logs.find_one({"channel_id": str(channel_id)}))
+
+    async def get_log_by_key(self, key: str) -> Optional[dict]:
+        return await self._unarchive(await self.logs.find_one({"key": key}))
+
+    async def _unarchive(self, log: Optional[dict]) -> Optional[dict]:
+        """Puts the messages of an archived log back into its stub."""
+        if log is None or not log.get("archived"):
+            return log
+        archived = await self.db.archived_logs.find_one({"_id": log["_id"]})
+        if archived is None:
+            logger.warning("The archived messages of log %s are missing.", log["key"])
+            return log
+        log["messages"] = await self.bot.loop.run_in_executor(
+            None, decompress_messages, archived["codec"], archived["messages"]
+        )
+        del log["archived"]
+        log.pop("message_count", None)
+        return log
+
+    async def get_archivable_logs(self, closed_before: str, limit: int) -> list:
+        return await self.logs.find(
+            {
+                "guild_id": str(self.bot.guild_id),
+                "open": False,
+                "closed_at": {"$lt": closed_before},
+                "archived": {"$ne": True},
+            },
+            limit=limit,
+        ).to_list(None)
+
+    async def archive_log(self, log: dict, codec: str, data: bytes, terms: str) -> None:
+        """
+        Moves the messages of a closed log to the `archived_logs` collection, leaving
+        a stub with the first few messages in the logs collection.
+        """
+        await self.db.archived_logs.replace_one(
+            {"_id": log["_id"]},
+            {
+                "_id": log["_id"],
+                "guild_id": log.get("guild_id"),
+                "codec": codec,
+                "messages": data,
+                "terms": terms,
+                "archived_at": str(datetime.utcnow()),
+            },
+            upsert=True,
+        )
+        await self.logs.update_one(
+            {"_id": log["_id"], "archived": {"$ne": True}},
+            {
+                "$set": {
+                    "archived": True,
+                    "message_count": len(log["messages"]),
+                    "messages": log["messages"][:PREVIEW_MESSAGES],
+                }
+            },
+        )
+
+    async def save_transcript(self, transcript) -> None:
+        size = len(transcript.html) + len(transcript.text)
+        if size > 15 * 1024 * 1024:
+            logger.warning("Transcript of log %s is too large to store.", transcript.key)
+            return
+        await self.db.transcripts.replace_one(
+            {"_id": transcript.key},
+            {
+                "_id": transcript.key,
+                "html": transcript.html,
+                "text": transcript.text,
+                "etag": transcript.etag,
+                "size": size,
+                "created_at": str(datetime.utcnow()),
+            },
+            upsert=True,
+        )
+
+    async def get_transcript(self, key: str) -> Optional[dict]:
+        return await self.db.transcripts.find_one({"_id": key})
+
+    async def _log_changed(self, log: Optional[dict]) -> None:
+        """Drops what was rendered from a log that just changed."""
+        if log is None:
+            return
+        self.bot.log_viewer.invalidate(log["key"])
+        if not log.get("open", True):
+            await self.db.transcripts.delete_one({"_id": log["key"]})
 
     async def get_log_link(self, channel_id: Union[str, int]) -> str:
         doc = await self.get_log(channel_id)
@@ -274,34 +543,36 @@ class MongoDBClient(ApiClient):
     ) -> str:
         key = secrets.token_hex(6)
 
-        await self.logs.insert_one(
-            {
-                "_id": key,
-                "key": key,
-                "open": True,
-                "created_at": str(datetime.utcnow()),
-                "closed_at": None,
-                "channel_id": str(channel.id),
-                "guild_id": str(self.bot.guild_id),
-                "bot_id": str(self.bot.user.id),
-                "recipient": {
-                    "id": str(recipient.id),
-                    "name": recipient.name,
-                    "discriminator": recipient.discriminator,
-                    "avatar_url": str(recipient.avatar_url),
-                    "mod": False,
-                },
-                "creator": {
-                    "id": str(creator.id),
-                    "name": creator.name,
-                    "discriminator": creator.discriminator,
-                    "avatar_url": str(creator.avatar_url),
-                    "mod": isinstance(creator, Member),
-                },
-                "closer": None,
-                "messages": [],
-            }
-        )
+        log = {
+            "_id": key,
+            "key": key,
+            "open": True,
+            "created_at": str(datetime.utcnow()),
+            "closed_at": None,
+            "channel_id": str(channel.id),
+            "category_id": str(channel.category_id) if channel.category_id else None,
+            "guild_id": str(self.bot.guild_id),
+            "bot_id": str(self.bot.user.id),
+            "recipient": {
+                "id": str(recipient.id),
+                "name": recipient.name,
+                "discriminator": recipient.discriminator,
+                "avatar_url": str(recipient.avatar_url),
+                "mod": False,
+            },
+            "creator": {
+                "id": str(creator.id),
+                "name": creator.name,
+                "discriminator": creator.discriminator,
+                "avatar_url": str(creator.avatar_url),
+                "mod": isinstance(creator, Member),
+            },
+            "closer": None,
+            "responders": [],
+            "messages": [],
+        }
+        await self.logs.insert_one(log)
+        self.bot.stats.record_open(log)
         logger.debug("Created a log entry, key %s.", key)
         prefix = self.bot.config["log_url_prefix"].strip("/")
         if prefix == "NONE":
@@ -310,8 +581,23 @@ class MongoDBClient(ApiClient):
 
     async def delete_log_entry(self, key: str) -> bool:
         result = await self.logs.delete_one({"key": key})
+        await self.db.archived_logs.delete_one({"_id": key})
+        await self._log_changed({"key": key, "open": False})
         return result.deleted_count == 1
 
+    async def close_logs(self, channel_ids: List[Union[int, str]], data: dict) -> int:
+        """Sets `data` on every open log of `channel_ids` in one round trip."""
+        if not channel_ids:
+            return 0
+        result = await self.logs.bulk_write(
+            [
+                UpdateOne({"channel_id": str(channel_id), "open": True}, {"$set": data})
+                for channel_id in channel_ids
+            ],
+            ordered=False,
+        )
+        return result.modified_count
+
     async def get_config(self) -> dict:
         conf = await self.db.config.find_one({"bot_id": self.bot.user.id})
         if conf is None:
@@ -326,6 +612,11 @@ class MongoDBClient(ApiClient):
             {k: 1 for k in self.bot.config.all_keys if k not in data}
         )
 
+        if self.bot.journal.enabled:
+            return await self.bot.journal.append("update_config", {"toset": toset, "unset": unset})
+        return await self._update_config(toset, unset)
+
+    async def _update_config(self, toset: dict, unset: dict):
         if toset and unset:
             return await self.db.config.update_one(
                 {"bot_id": self.bot.user.id}, {"$set": toset, "$unset": unset}
@@ -336,10 +627,19 @@ class MongoDBClient(ApiClient):
             return await self.db.config.update_one({"bot_id": self.bot.user.id}, {"$unset": unset})
 
     async def edit_message(self, message_id: Union[int, str], new_content: str) -> None:
-        await self.logs.update_one(
+        if self.bot.journal.enabled:
+            return await self.bot.journal.append(
+                "edit_message", {"message_id": str(message_id), "new_content": new_content}
+            )
+        await self._edit_message(str(message_id), new_content)
+
+    async def _edit_message(self, message_id: str, new_content: str) -> None:
+        log = await self.logs.find_one_and_update(
             {"messages.message_id": str(message_id)},
             {"$set": {"messages.$.content": new_content, "messages.$.edited": True}},
+            projection={"key": 1, "open": 1},
         )
+        await self._log_changed(log)
 
     async def append_log(
         self,
@@ -348,8 +648,10 @@ class MongoDBClient(ApiClient):
         message_id: str = "",
         channel_id: str = "",
         type_: str = "thread_message",
-    ) -> dict:
+        groups: Dict[str, int] = None,
+    ) -> Optional[dict]:
         channel_id = str(channel_id) or str(message.channel.id)
+        groups = groups or {}
         message_id = str(message_id) or str(message.id)
 
         data = {
@@ -371,28 +673,118 @@ class MongoDBClient(ApiClient):
                     "is_image": a.width is not None,
                     "size": a.size,
                     "url": a.url,
+                    "group": groups.get(a.url, 0),
                 }
                 for a in message.attachments
             ],
         }
 
-        return await self.logs.find_one_and_update(
-            {"channel_id": channel_id}, {"$push": {"messages": data}}, return_document=True
+        if self.bot.journal.enabled:
+            await self.bot.journal.append("append_log", {"channel_id": channel_id, "data": data})
+            return None
+        return await self._append_log(channel_id, data)
+
+    async def _append_log(self, channel_id: str, data: dict) -> Optional[dict]:
+        update = {"$push": {"messages": data}}
+        responded = data["author"]["mod"] and data["type"] in REPLY_TYPES
+        if responded:
+            update["$addToSet"] = {"responders": data["author"]["id"]}
+        # Matches nothing if the message is logged already, when a journal entry is replayed
+        log = await self.logs.find_one_and_update(
+            {"channel_id": channel_id, "messages.message_id": {"$ne": data["message_id"]}},
+            update,
+            return_document=True,
+        )
+        if log is None:
+            return None
+        if data["attachments"]:
+            self.bot.attachment_mirror.schedule(
+                channel_id, data["message_id"], data["attachments"]
+            )
+        if responded:
+            first = False
+            if log.get("first_response_at") is None:
+                # Only one reply can set it, even if several are appended at once
+                result = await self.logs.update_one(
+                    {"_id": log["_id"], "first_response_at": None},
+                    {"$set": {"first_response_at": data["timestamp"]}},
+                )
+                first = result.modified_count == 1
+            self.bot.stats.record_reply(log, data, first)
+        return log
+
+    async def update_attachment_url(
+        self, channel_id: str, message_id: str, attachment_id: int, url: str, *, original_url: str
+    ) -> None:
+        log = await self.logs.find_one_and_update(
+            {"channel_id": str(channel_id)},
+            {
+                "$set": {
+                    "messages.$[m].attachments.$[a].url": url,
+                    "messages.$[m].attachments.$[a].original_url": original_url,
+                    "messages.$[m].attachments.$[a].mirrored": True,
+                }
+            },
+            array_filters=[{"m.message_id": str(message_id)}, {"a.id": attachment_id}],
+            projection={"key": 1, "open": 1},
         )
+        await self._log_changed(log)
+
+    async def apply_journal_entry(self, op: str, args: dict) -> None:
+        """Applies a write recorded by the `Journal`."""
+        if op == "append_log":
+            await self._append_log(**args)
+        elif op == "edit_message":
+            await self._edit_message(**args)
+        elif op == "update_config":
+            await self._update_config(**args)
+        else:
+            raise ValueError(f"Unknown journal operation {op}.")
 
     async def post_log(self, channel_id: Union[int, str], data: dict) -> dict:
-        return await self.logs.find_one_and_update(
+        log = await self.logs.find_one_and_update(
             {"channel_id": str(channel_id)}, {"$set": data}, return_document=True
         )
+        if log is not None:
+            self.bot.log_viewer.invalidate(log["key"])
+        return log
+
+    async def update_stats(self, day: str, updates: List[Tuple[str, str, dict]]) -> None:
+        """Increments the rollup counters of `day`, given as (scope, subject, counters)."""
+        guild_id = str(self.bot.guild_id)
+        await self.db.stats.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": f"{guild_id}:{day}:{scope}:{subject}"},
+                    {
+                        "$inc": counters,
+                        "$setOnInsert": {
+                            "guild_id": guild_id,
+                            "day": day,
+                            "scope": scope,
+                            "subject": subject,
+                        },
+                    },
+                    upsert=True,
+                )
+                for scope, subject, counters in updates
+            ],
+            ordered=False,
+        )
+
+    async def get_stats(self, since: str) -> list:
+        return await self.analytics_db.stats.find(
+            {"guild_id": str(self.bot.guild_id), "day": {"$gte": since}}
+        ).to_list(None)
 
     async def search_closed_by(self, user_id: Union[int, str]):
-        return await self.logs.find(
+        return await self.analytics_logs.find(
             {"guild_id": str(self.bot.guild_id), "open": False, "closer.id": str(user_id)},
             {"messages": {"$slice": 5}},
         ).to_list(None)
 
     async def search_by_text(self, text: str, limit: Optional[int]):
-        return await self.bot.db.logs.find(
+        logs = await self.analytics_logs.find(
             {
                 "guild_id": str(self.bot.guild_id),
                 "open": False,
@@ -400,6 +792,42 @@ class MongoDBClient(ApiClient):
             },
             {"messages": {"$slice": 5}},
         ).to_list(limit)
+        if limit is not None and len(logs) >= limit:
+            return logs
+
+        # Archived logs are only indexed by their words, check the phrase on the messages
+        words = WORD_PATTERN.findall(text.lower())
+        if not words:
+            return logs
+        found = {log["_id"] for log in logs}
+        needle = text.lower()
+        cursor = self.analytics_db.archived_logs.find(
+            {
+                "guild_id": str(self.bot.guild_id),
+                "$text": {"$search": " ".join(f'"{word}"' for word in words)},
+            },
+            {"codec": 1, "messages": 1},
+        )
+        async for archived in cursor:
+            if archived["_id"] in found:
+                continue
+            messages = await self.bot.loop.run_in_executor(
+                None, decompress_messages, archived["codec"], archived["messages"]
+            )
+            if not any(
+                needle in (m.get("content") or "").lower()
+                or needle in (m.get("author") or {}).get("name", "").lower()
+                for m in messages
+            ):
+                continue
+            log = await self.analytics_logs.find_one(
+                {"_id": archived["_id"]}, {"messages": {"$slice": 5}}
+            )
+            if log is not None:
+                logs.append(log)
+                if limit is not None and len(logs) >= limit:
+                    break
+        return logs
 
     def get_plugin_partition(self, cog):
         cls_name = cog.__class__.__name__
@@ -28,19 +28,27 @@ class ConfigManager:
         # bot settings
         "main_category_id": "751316720140025926",
         "fallback_category_id": "752272179353223328",
+        "channel_pool_size": 0,
         "prefix": "?",
         "mention": "@here",
         "main_color": "#a561ff",
         "error_color": str(discord.Color.red()),
         "user_typing": False,
         "mod_typing": False,
+        "reply_typing": False,
+        "thread_webhooks": False,
+        "attach_transcript": False,
         "account_age": isodate.Duration(),
         "guild_age": isodate.Duration(),
         "thread_cooldown": isodate.Duration(),
         "reply_without_command": False,
         "anon_reply_without_command": False,
+        # flood control
+        "flood_control_burst": 5,
+        "flood_control_interval": 2,
         # logging
         "log_channel_id": "751181156786896927",
+        "archive_logs_after": isodate.Duration(),
         # threads
         "sent_emoji": "✅",
         "blocked_emoji": "🚫",
@@ -95,6 +103,7 @@ class ConfigManager:
         "notification_squad": {},
         "subscriptions": {},
         "closures": {},
+        "overflow_category_ids": [],
         # misc
         "plugins": [],
         "aliases": {},
@@ -118,15 +127,51 @@ class ConfigManager:
         "github_token": None,
         # Logging
         "log_level": "INFO",
+        # attachment mirror
+        "attachment_mirror": False,
+        "attachment_mirror_path": None,
+        "attachment_mirror_url": None,
+        "attachment_mirror_max_size": 8 * 1024 * 1024,
+        # log viewer
+        "log_viewer": False,
+        "log_viewer_host": "0.0.0.0",
+        "log_viewer_port": 8000,
+        # metrics endpoint
+        "metrics_endpoint": False,
+        "metrics_host": "127.0.0.1",
+        "metrics_port": 9100,
+        # relay tracing
+        "trace_file": None,
+        # database write journal
+        "db_journal": False,
+        "db_journal_path": None,
+        # database connections
+        "db_max_pool_size": 100,
+        "db_min_pool_size": 0,
+        "db_compressors": None,
+        "db_timeout": 30,
+        "db_socket_timeout": 0,
+        "analytics_uri": None,
+        "analytics_read_preference": "secondaryPreferred",
+        "analytics_max_pool_size": 10,
     }
 
     colors = {"mod_color", "recipient_color", "main_color", "error_color"}
 
-    time_deltas = {"account_age", "guild_age", "thread_auto_close", "thread_cooldown"}
+    time_deltas = {
+        "account_age",
+        "guild_age",
+        "thread_auto_close",
+        "thread_cooldown",
+        "archive_logs_after",
+    }
 
     booleans = {
         "user_typing",
         "mod_typing",
+        "reply_typing",
+        "thread_webhooks",
+        "attach_transcript",
         "reply_without_command",
         "anon_reply_without_command",
         "recipient_thread_close",
@@ -134,6 +179,24 @@ class ConfigManager:
         "thread_move_notify",
         "enable_plugins",
         "enable_eval",
+        "attachment_mirror",
+        "log_viewer",
+        "db_journal",
+        "metrics_endpoint",
+    }
+
+    integers = {
+        "flood_control_burst",
+        "flood_control_interval",
+        "channel_pool_size",
+        "attachment_mirror_max_size",
+        "log_viewer_port",
+        "metrics_port",
+        "db_max_pool_size",
+        "db_min_pool_size",
+        "db_timeout",
+        "db_socket_timeout",
+        "analytics_max_pool_size",
     }
 
     special_types = {"status", "activity_type"}
@@ -249,6 +312,13 @@ class ConfigManager:
             except ValueError:
                 value = self.remove(key)
 
+        elif key in self.integers:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                logger.warning("Invalid %s provided, must be a whole number.", key)
+                value = self.remove(key)
+
         elif key in self.special_types:
             if value is None:
                 return None
@@ -326,6 +396,15 @@ class ConfigManager:
             except ValueError:
                 raise InvalidConfigError("Must be a yes/no value.")
 
+        if key in self.integers:
+            try:
+                item = int(item)
+            except (TypeError, ValueError):
+                raise InvalidConfigError("Must be a whole number.")
+            if item < 0:
+                raise InvalidConfigError("Must not be negative.")
+            return self.__setitem__(key, item)
+
         # elif key in self.special_types:
         #     if key == "status":
 
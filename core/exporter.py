@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+
+import discord
+from aiohttp import web
+
+from core.metrics import to_prometheus
+from core.models import getLogger
+
+__all__ = ["MetricsExporter"]
+
+logger = getLogger(__name__)
+
+DESCRIPTIONS = {
+    "gateway_latency_seconds": "Time between a gateway heartbeat and its acknowledgement.",
+    "event_loop_lag_seconds": "How late the event loop ran a callback scheduled in time.",
+    "open_threads": "Threads in the thread cache.",
+    "asyncio_tasks": "Tasks on the event loop that haven't finished.",
+    "relay_seconds": "Time to relay a message, by direction.",
+    "relay_messages_total": "Messages relayed, by direction.",
+    "discord_rest_requests_total": "Discord REST requests, by route and result.",
+    "discord_rest_seconds": "Discord REST request time, rate limit waits included.",
+    "discord_rate_limits_total": "429 responses from Discord, by scope.",
+    "db_operation_seconds": "Database operation time, by operation.",
+    "db_operation_errors_total": "Failed database operations, by operation and error.",
+    "db_operations_in_flight": "Database operations running, by operation.",
+}
+
+
+class _RateLimitHandler(logging.Handler):
+    """Counts the rate limits discord.py logs, it retries them without telling the caller."""
+
+    def __init__(self, metrics):
+        super().__init__(logging.WARNING)
+        self.metrics = metrics
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = str(record.msg)
+        if message.startswith("We are being rate limited"):
+            self.metrics.counter("discord_rate_limits_total", scope="bucket").inc()
+        elif message.startswith("Global rate limit has been hit"):
+            self.metrics.counter("discord_rate_limits_total", scope="global").inc()
+
+
+class MetricsExporter:
+    """
+    Serves the bot's metrics at `/metrics`, in the Prometheus text format.
+
+    Besides everything recorded in `bot.metrics`, it keeps track of what only
+    matters to an outside observer while it runs: the event loop lag, Discord
+    REST calls and 429s, and at every scrape the gateway latency, open threads
+    and pending tasks.
+
+    Enabled with the `metrics_endpoint` config, listening on `metrics_host`
+    and `metrics_port`.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    lag_interval : float
+        How often the event loop lag is sampled, in seconds.
+    """
+
+    def __init__(self, bot, *, lag_interval: float = 0.5):
+        self.bot = bot
+        self.lag_interval = lag_interval
+        self.runner = None
+        self._lag_task = None
+        self._request = None
+        self._rate_limit_handler = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.bot.config.get("metrics_endpoint")
+
+    async def start(self) -> None:
+        """Starts the server, does nothing if it's running or the endpoint is off."""
+        if self.runner is not None or not self.enabled:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        host = self.bot.config["metrics_host"]
+        port = self.bot.config.get("metrics_port")
+        try:
+            await web.TCPSite(self.runner, host, port).start()
+        except OSError as e:
+            logger.error("Failed to start the metrics endpoint on %s:%s: %s.", host, port, e)
+            await self.stop()
+            return
+        logger.info("Metrics endpoint listening on %s:%s.", host, port)
+
+        for name, description in DESCRIPTIONS.items():
+            self.bot.metrics.describe(name, description)
+        self._instrument_http()
+        self._rate_limit_handler = _RateLimitHandler(self.bot.metrics)
+        logging.getLogger("discord.http").addHandler(self._rate_limit_handler)
+        self._lag_task = self.bot.loop.create_task(self._sample_lag())
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._rate_limit_handler is not None:
+            logging.getLogger("discord.http").removeHandler(self._rate_limit_handler)
+            self._rate_limit_handler = None
+        if self._request is not None:
+            self.bot.http.request = self._request
+            self._request = None
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def _instrument_http(self) -> None:
+        request = self._request = self.bot.http.request
+        metrics = self.bot.metrics
+
+        async def timed_request(route, **kwargs):
+            started = time.perf_counter()
+            result = "ok"
+            try:
+                return await request(route, **kwargs)
+            except discord.HTTPException as e:
+                result = str(e.status)
+                raise
+            except Exception:
+                result = "error"
+                raise
+            finally:
+                metrics.counter(
+                    "discord_rest_requests_total",
+                    method=route.method,
+                    route=route.path,
+                    result=result,
+                ).inc()
+                metrics.histogram("discord_rest_seconds", method=route.method).record(
+                    time.perf_counter() - started
+                )
+
+        self.bot.http.request = timed_request
+
+    async def _sample_lag(self) -> None:
+        histogram = self.bot.metrics.histogram("event_loop_lag_seconds")
+        while True:
+            scheduled = self.bot.loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            histogram.record(max(self.bot.loop.time() - scheduled, 0))
+
+    def _sample(self) -> None:
+        metrics = self.bot.metrics
+        # NaN until the first heartbeat is acknowledged
+        metrics.gauge("gateway_latency_seconds").set(self.bot.latency)
+        metrics.gauge("open_threads").set(len(self.bot.threads))
+        metrics.gauge("asyncio_tasks").set(len(asyncio.all_tasks(self.bot.loop)))
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        self._sample()
+        return web.Response(
+            body=to_prometheus(self.bot.metrics).encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
@@ -0,0 +1,198 @@
+import typing
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import discord
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    A token bucket holding up to `capacity` tokens, refilled with one token every `interval` seconds.
+    """
+
+    def __init__(self, capacity: int, interval: float, now: float):
+        self.capacity = capacity
+        self.interval = interval
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if self.interval <= 0:
+            self.tokens = float(self.capacity)
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+        self.updated = now
+
+    def consume(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self, now: float) -> float:
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) * self.interval)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def merge_messages(messages: typing.List[discord.Message]) -> SimpleNamespace:
+    """
+    Merges consecutive DMs from one user into a single message-like object
+    that can be relayed and logged as one message.
+
+    It takes the ID of the last message, `parts` maps the ID of every merged
+    message to its content.
+    """
+    last = messages[-1]
+    return SimpleNamespace(
+        id=last.id,
+        author=last.author,
+        channel=last.channel,
+        created_at=messages[0].created_at,
+        content="\n".join(m.content for m in messages if m.content),
+        attachments=[a for m in messages for a in m.attachments],
+        parts={m.id: m.content for m in messages},
+    )
+
+
+def edit_merged(merged: SimpleNamespace, message_id: int, content: str) -> str:
+    """Replaces the content of one of the messages in a merged message, returns the new content."""
+    merged.parts[message_id] = content
+    merged.content = "\n".join(c for c in merged.parts.values() if c)
+    return merged.content
+
+
+class FloodControl:
+    """
+    Per-user token bucket rate limiting ahead of `ModmailBot.process_dm_modmail`.
+
+    Messages within the bucket's budget are relayed straight away. Messages over the
+    budget are held back and relayed together as one merged message once the user's
+    bucket has a token again.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+
+    Attributes
+    ----------
+    throttled : int
+        The number of messages that were held back.
+    batches : int
+        The number of merged relays sent.
+    """
+
+    max_content = 2000
+    max_buckets = 1000
+    max_merged = 1000
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.throttled = 0
+        self.batches = 0
+        self._buckets = {}
+        self._pending = {}
+        self._merged = OrderedDict()
+
+    def merged(self, message_id: int) -> typing.Optional[SimpleNamespace]:
+        """
+        The merged message a held back DM was relayed as, so edits and deletes of
+        any DM in the batch find the relayed message. `None` if it wasn't merged.
+        """
+        return self._merged.get(message_id)
+
+    def _remember(self, merged: SimpleNamespace) -> None:
+        for message_id in merged.parts:
+            self._merged[message_id] = merged
+            self._merged.move_to_end(message_id)
+        while len(self._merged) > self.max_merged:
+            self._merged.popitem(last=False)
+
+    def _bucket(self, user_id: int, now: float) -> typing.Optional[TokenBucket]:
+        capacity = self.bot.config.get("flood_control_burst")
+        interval = self.bot.config.get("flood_control_interval")
+        if capacity <= 0:
+            return None
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None or bucket.capacity != capacity or bucket.interval != interval:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune(now)
+            bucket = self._buckets[user_id] = TokenBucket(capacity, interval, now)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        for user_id, bucket in tuple(self._buckets.items()):
+            if user_id not in self._pending and bucket.is_full(now):
+                del self._buckets[user_id]
+
+    def allow(self, message: discord.Message) -> bool:
+        """
+        Checks whether a DM can be relayed now.
+
+        Returns
+        -------
+        bool
+            `True` if the message should be processed straight away,
+            `False` if it was queued for a merged relay.
+        """
+        user_id = message.author.id
+        now = self.bot.loop.time()
+
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            # Keep ordering, anything after a throttled message waits for the batch
+            pending.append(message)
+            self.throttled += 1
+            return False
+
+        bucket = self._bucket(user_id, now)
+        if bucket is None or bucket.consume(now):
+            return True
+
+        self.throttled += 1
+        self._pending[user_id] = [message]
+        self.bot.loop.call_later(
+            bucket.retry_after(now), lambda: self.bot.loop.create_task(self._flush(user_id))
+        )
+        logger.debug("Throttling DMs from user %s.", message.author)
+        return False
+
+    async def _flush(self, user_id: int) -> None:
+        messages = self._pending.pop(user_id, [])
+        bucket = self._buckets.get(user_id)
+        if bucket is not None:
+            bucket.consume(self.bot.loop.time())
+
+        batch = []
+        length = 0
+        for message in messages:
+            if batch and length + len(message.content) + 1 > self.max_content:
+                await self._relay(batch)
+                batch = []
+                length = 0
+            batch.append(message)
+            length += len(message.content) + 1
+        if batch:
+            await self._relay(batch)
+
+    async def _relay(self, batch: typing.List[discord.Message]) -> None:
+        self.batches += 1
+        if len(batch) == 1:
+            message = batch[0]
+        else:
+            message = merge_messages(batch)
+            self._remember(message)
+        try:
+            await self.bot.relay_dm_modmail(message, react_to=batch[-1])
+        except Exception:
+            logger.error("Failed to relay throttled messages:", exc_info=True)
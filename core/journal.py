@@ -0,0 +1,397 @@
+import asyncio
+import os
+import time
+import typing
+
+from bson import json_util
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, WTimeoutError
+
+from core.models import getLogger
+
+__all__ = ["CircuitBreaker", "Journal"]
+
+logger = getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT = "checkpoint"
+
+# Errors that mean the database is unavailable, rather than the entry being bad
+TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionFailure, ExecutionTimeout, WTimeoutError)
+
+
+class CircuitBreaker:
+    """
+    Stops hammering the database while it's failing.
+
+    After `threshold` failures in a row the breaker opens and nothing is tried
+    for `delay` seconds, then a single attempt is let through (half-open). If
+    it succeeds the breaker closes, otherwise it opens again for twice as long,
+    up to `max_delay`.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(self, *, threshold: int = 3, delay: float = 1, max_delay: float = 60):
+        self.threshold = threshold
+        self.delay = delay
+        self.max_delay = max_delay
+        self.state = self.CLOSED
+        self.failures = 0
+        self._open_for = delay
+        self._open_until = 0
+
+    async def wait(self) -> None:
+        """Waits until an attempt may be made."""
+        if self.state == self.OPEN:
+            await asyncio.sleep(max(self._open_until - time.monotonic(), 0))
+            self.state = self.HALF_OPEN
+
+    def success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Database writes are going through again, closing the circuit breaker.")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._open_for = self.delay
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self._open_for = min(self._open_for * 2, self.max_delay)
+        elif self.failures < self.threshold:
+            return
+        if self.state != self.OPEN:
+            logger.warning("Database writes are failing, pausing them for %ss.", self._open_for)
+        self.state = self.OPEN
+        self._open_until = time.monotonic() + self._open_for
+
+
+class Journal:
+    """
+    A local write-ahead journal for database writes.
+
+    Writes are appended to segment files and fsynced in batches (everything
+    appended while the previous batch was being synced goes in the next one),
+    then applied to the database in order by a background replayer. Callers
+    only wait for the local disk, so a slow or unreachable database doesn't
+    hold up relaying, and writes still pending at shutdown are applied on the
+    next start.
+
+    Entries must be idempotent, an entry may be applied again if the bot stops
+    between applying it and saving the checkpoint. Entries the database rejects
+    are logged and dropped. While the database is unavailable the replayer
+    retries behind a `CircuitBreaker`.
+
+    Enabled with the `db_journal` config, files are kept in `db_journal_path`.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    segment_size : int
+        The size after which a new segment file is started, in bytes.
+    batch_size : int
+        The number of entries the replayer reads at once.
+    timeout : float
+        How long applying an entry may take before it's retried, in seconds.
+    """
+
+    def __init__(
+        self,
+        bot,
+        *,
+        segment_size: int = 4 * 1024 * 1024,
+        batch_size: int = 100,
+        timeout: float = 10,
+    ):
+        self.bot = bot
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+
+        self._seq = 0
+        self._written = 0
+        self._applied = 0
+        self._next_ts = None
+        self._buffer = []
+        self._file = None
+        self._active = None
+        self._durable = 0
+        self._reader = None
+        self._finished = []
+        self._flush_wanted = asyncio.Event()
+        self._readable = asyncio.Event()
+        self._tasks = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.bot.config.get("db_journal")
+
+    @property
+    def path(self) -> str:
+        return self.bot.config["db_journal_path"] or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp", "journal"
+        )
+
+    @property
+    def pending(self) -> int:
+        """The number of entries written but not applied yet."""
+        return max(self._written - self._applied, 0)
+
+    @property
+    def lag(self) -> float:
+        """How long ago the oldest entry not applied yet was written, in seconds."""
+        if not self.pending or self._next_ts is None:
+            return 0
+        return max(time.time() - self._next_ts, 0)
+
+    def _segments(self) -> typing.List[str]:
+        return sorted(name for name in os.listdir(self.path) if name.endswith(SEGMENT_SUFFIX))
+
+    def start(self) -> None:
+        """
+        Recovers the journal from disk and starts writing and replaying, does
+        nothing if it's running. Also runs when the journal is off but entries
+        from before are left to apply.
+        """
+        if self._tasks:
+            return
+        if not self.enabled and not (os.path.isdir(self.path) and self._segments()):
+            return
+        self._recover()
+        self._tasks = [
+            self.bot.loop.create_task(self._flush_loop()),
+            self.bot.loop.create_task(self._replay_loop()),
+        ]
+
+    def _recover(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        checkpoint = os.path.join(self.path, CHECKPOINT)
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                self._applied = int(f.read().strip() or 0)
+
+        self._seq = self._applied
+        segments = self._segments()
+        if segments:
+            self._seq = max(self._seq, int(segments[-1][: -len(SEGMENT_SUFFIX)]) - 1)
+            with open(os.path.join(self.path, segments[-1]), "rb+") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    # The bot stopped halfway through writing this entry, it was never acknowledged
+                    f.truncate(end)
+                lines = data[:end].splitlines()
+                if lines:
+                    self._seq = max(self._seq, json_util.loads(lines[-1])["seq"])
+            self._reader = (segments[0], 0)
+        self._written = self._seq
+        if self.pending:
+            logger.info("Replaying %d journal entries.", self.pending)
+
+    async def append(self, op: str, args: dict) -> None:
+        """
+        Journals a write, returns once it's on disk.
+
+        If the journal can't be written to, the write is applied to the
+        database right away instead.
+
+        Parameters
+        ----------
+        op : str
+            The `ApiClient.apply_journal_entry` operation.
+        args : dict
+            The arguments of the operation.
+        """
+        self.start()
+        self._seq += 1
+        entry = {"seq": self._seq, "ts": time.time(), "op": op, "args": args}
+        line = json_util.dumps(entry).encode("utf-8") + b"\n"
+        future = self.bot.loop.create_future()
+        self._buffer.append((self._seq, line, future))
+        self._flush_wanted.set()
+        try:
+            await future
+        except OSError:
+            logger.warning("Failed to journal a write, applying it directly.", exc_info=True)
+            await self.bot.api.apply_journal_entry(op, args)
+
+    def _write(self, lines: typing.List[bytes], first_seq: int) -> typing.Tuple[str, int]:
+        if self._file is None or self._file.tell() >= self.segment_size:
+            if self._file is not None:
+                self._file.close()
+            name = f"{first_seq:020d}{SEGMENT_SUFFIX}"
+            self._file = open(os.path.join(self.path, name), "ab")
+        self._file.writelines(lines)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return os.path.basename(self._file.name), self._file.tell()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._flush_wanted.wait()
+            self._flush_wanted.clear()
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                continue
+
+            started = self.bot.loop.time()
+            try:
+                self._active, self._durable = await self.bot.loop.run_in_executor(
+                    None, self._write, [line for _, line, _ in batch], batch[0][0]
+                )
+            except OSError as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.bot.metrics.histogram("journal_fsync_seconds").record(
+                self.bot.loop.time() - started
+            )
+            self.bot.metrics.counter("journal_entries_total").inc(len(batch))
+
+            self._written = batch[-1][0]
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            self._readable.set()
+            self._update_metrics()
+
+    def _read(self, limit: int, active: str, durable: int) -> typing.List[dict]:
+        entries = []
+        while len(entries) < limit:
+            segments = self._segments()
+            if self._reader is None:
+                if not segments:
+                    break
+                self._reader = (segments[0], 0)
+            name, offset = self._reader
+
+            path = os.path.join(self.path, name)
+            # Only read what's synced from the segment being written
+            end = durable if name == active else os.path.getsize(path)
+            if offset >= end:
+                later = [segment for segment in segments if segment > name]
+                if name == active or not later:
+                    break
+                self._finished.append(name)
+                self._reader = (later[0], 0)
+                continue
+
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while len(entries) < limit and f.tell() < end:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    entries.append(json_util.loads(line))
+                self._reader = (name, f.tell())
+        return entries
+
+    def _save_checkpoint(self, applied: int, finished: typing.List[str]) -> None:
+        path = os.path.join(self.path, CHECKPOINT)
+        with open(path + ".tmp", "w") as f:
+            f.write(str(applied))
+        os.replace(path + ".tmp", path)
+        for name in finished:
+            os.remove(os.path.join(self.path, name))
+
+    async def _replay_loop(self) -> None:
+        while True:
+            self._readable.clear()
+            entries = await self.bot.loop.run_in_executor(
+                None, self._read, self.batch_size, self._active, self._durable
+            )
+            if not entries:
+                self._update_metrics()
+                await self._readable.wait()
+                continue
+
+            for i, entry in enumerate(entries):
+                if entry["seq"] <= self._applied:
+                    continue
+                self._next_ts = entry["ts"]
+                # Config updates write the whole config, only the last one matters
+                superseded = entry["op"] == "update_config" and any(
+                    later["op"] == "update_config" for later in entries[i + 1 :]
+                )
+                if not superseded:
+                    # If this is cancelled by close(), the entry isn't counted as applied
+                    # and is replayed on the next start
+                    await self._apply(entry)
+                self._applied = entry["seq"]
+
+            finished, self._finished = self._finished, []
+            await self.bot.loop.run_in_executor(
+                None, self._save_checkpoint, self._applied, finished
+            )
+            self._update_metrics()
+
+    async def _apply(self, entry: dict) -> None:
+        while True:
+            await self.breaker.wait()
+            try:
+                await asyncio.wait_for(
+                    self.bot.api.apply_journal_entry(entry["op"], entry["args"]), self.timeout
+                )
+            except TRANSIENT_ERRORS as e:
+                logger.debug("Failed to apply journal entry %d: %s.", entry["seq"], e)
+                self.breaker.failure()
+                self._update_metrics()
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error(
+                    "Dropping journal entry %d (%s), it can't be applied.",
+                    entry["seq"],
+                    entry["op"],
+                    exc_info=True,
+                )
+                self.bot.metrics.counter("journal_entries_dropped_total").inc()
+            self.breaker.success()
+            return
+
+    def _update_metrics(self) -> None:
+        self.bot.metrics.gauge("journal_pending_entries").set(self.pending)
+        self.bot.metrics.gauge("journal_replay_lag_seconds").set(self.lag)
+        self.bot.metrics.gauge("journal_breaker_open").set(
+            {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 0.5, CircuitBreaker.OPEN: 1}[
+                self.breaker.state
+            ]
+        )
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Waits until everything journaled so far is applied.
+
+        Returns
+        -------
+        bool
+            Whether it was, `False` if `timeout` seconds passed first.
+        """
+        target = self._written
+        deadline = self.bot.loop.time() + timeout
+        while self._applied < target:
+            if self.bot.loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def close(self) -> None:
+        """Writes out what's buffered and stops, the rest is applied on the next start."""
+        if not self._tasks:
+            return
+        futures = [future for _, _, future in self._buffer]
+        if futures:
+            self._flush_wanted.set()
+            await asyncio.wait(futures, timeout=5)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,279 @@
+import gzip
+import hashlib
+import typing
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from core.attachments import LocalAttachmentStore
+from core.models import getLogger
+from core.transcript import render_transcript, render_transcript_html
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = getLogger(__name__)
+
+
+class CachedPage(typing.NamedTuple):
+    body: bytes
+    gzip: bytes
+    brotli: typing.Optional[bytes]
+    etag: str
+    last_modified: typing.Optional[datetime]
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip) + len(self.brotli or b"")
+
+
+def _last_modified(value: typing.Optional[str]) -> typing.Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(microsecond=0, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def build_page(log: dict) -> CachedPage:
+    """Renders and compresses a closed log, meant to run in an executor."""
+    body = render_transcript_html(log).encode("utf-8")
+    return CachedPage(
+        body=body,
+        gzip=gzip.compress(body, 6),
+        brotli=brotli.compress(body) if brotli is not None else None,
+        etag='"' + hashlib.sha1(body).hexdigest() + '"',
+        last_modified=_last_modified(log.get("closed_at")),
+    )
+
+
+def page_from_transcript(transcript: dict, text: bool = False) -> CachedPage:
+    """Wraps a stored transcript, which is already rendered and compressed."""
+    compressed = transcript["text" if text else "html"]
+    return CachedPage(
+        body=gzip.decompress(compressed),
+        gzip=compressed,
+        brotli=None,
+        etag=transcript["etag"],
+        last_modified=_last_modified(transcript.get("created_at")),
+    )
+
+
+class LogViewer:
+    """
+    A small HTTP server that serves thread logs straight from the database, at the
+    same paths as the links the bot hands out (`log_url` + `log_url_prefix` + key).
+
+    Closed logs are served from the transcript stored when they were closed, or
+    rendered once if there is none. Pages are kept in an LRU cache, precompressed
+    with gzip (and brotli if it's installed) and served with ETag and
+    Last-Modified headers. Open logs and very long logs are streamed instead of
+    cached. Cached pages are dropped when their log changes through the
+    `ApiClient`. The plain text transcript is served at `<key>.txt`.
+
+    Enabled with the `log_viewer` config, listening on `log_viewer_host` and
+    `log_viewer_port`.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    max_cache_size : int
+        The most bytes of rendered pages kept in memory.
+    stream_threshold : int
+        Logs with more messages than this are always streamed.
+    """
+
+    def __init__(
+        self, bot, *, max_cache_size: int = 64 * 1024 * 1024, stream_threshold: int = 2000
+    ):
+        self.bot = bot
+        self.max_cache_size = max_cache_size
+        self.stream_threshold = stream_threshold
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._building = {}
+        self.runner = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.bot.config.get("log_viewer")
+
+    @property
+    def prefix(self) -> str:
+        prefix = self.bot.config["log_url_prefix"].strip("/")
+        return "" if prefix == "NONE" else prefix
+
+    async def start(self) -> None:
+        """Starts the server, does nothing if it's running or the viewer is off."""
+        if self.runner is not None or not self.enabled:
+            return
+
+        app = web.Application()
+        path = f"/{self.prefix}" if self.prefix else ""
+        app.router.add_get(path + "/{key:[^/.]+}.txt", self.handle_text)
+        app.router.add_get(path + "/{key:[^/.]+}", self.handle_log)
+
+        store = self.bot.attachment_mirror.store if self.bot.attachment_mirror.enabled else None
+        if isinstance(store, LocalAttachmentStore):
+            app.router.add_static("/attachments", store.root, append_version=False)
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        host = self.bot.config["log_viewer_host"]
+        port = self.bot.config.get("log_viewer_port")
+        try:
+            await web.TCPSite(self.runner, host, port).start()
+        except OSError as e:
+            logger.error("Failed to start the log viewer on %s:%s: %s.", host, port, e)
+            await self.stop()
+            return
+        logger.info("Log viewer listening on %s:%s.", host, port)
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def invalidate(self, key: str) -> None:
+        """Drops the cached page of a log."""
+        if key in self._building:
+            # Don't cache a page rendered from the old log
+            self._building[key] = True
+        for cache_key in (key, key + ".txt"):
+            page = self._cache.pop(cache_key, None)
+            if page is not None:
+                self._cache_size -= page.size
+
+    def _remember(self, key: str, page: CachedPage) -> None:
+        if page.size > self.max_cache_size:
+            return
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self._cache_size -= previous.size
+        self._cache[key] = page
+        self._cache_size += page.size
+        while self._cache_size > self.max_cache_size:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_size -= evicted.size
+
+    @staticmethod
+    def _encoding(request: web.Request, page: CachedPage) -> typing.Optional[str]:
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in request.headers.get("Accept-Encoding", "").split(",")
+        }
+        if page.brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    async def handle_text(self, request: web.Request) -> web.StreamResponse:
+        key = request.match_info["key"]
+
+        page = self._cache.get(key + ".txt")
+        if page is None:
+            transcript = await self.bot.api.get_transcript(key)
+            if transcript is None:
+                log = await self.bot.api.get_log_by_key(key)
+                if log is None:
+                    raise web.HTTPNotFound(text="Registro no encontrado.")
+                if log.get("open"):
+                    raise web.HTTPNotFound(text="El ticket sigue abierto.")
+                transcript = await self.bot.transcripts.create(log)
+                if transcript is None:
+                    raise web.HTTPServiceUnavailable()
+                transcript = transcript._asdict()
+            page = page_from_transcript(transcript, text=True)
+            self._remember(key + ".txt", page)
+        return self._respond(request, page, "text/plain")
+
+    async def handle_log(self, request: web.Request) -> web.StreamResponse:
+        key = request.match_info["key"]
+
+        page = self._cache.get(key)
+        if page is not None:
+            self._cache.move_to_end(key)
+            self.bot.metrics.counter("log_viewer_requests_total", result="hit").inc()
+            return self._respond(request, page)
+
+        self._building[key] = False
+        transcript = await self.bot.api.get_transcript(key)
+        if transcript is not None:
+            page = page_from_transcript(transcript)
+            self.bot.metrics.counter("log_viewer_requests_total", result="stored").inc()
+        else:
+            log = await self.bot.api.get_log_by_key(key)
+            if log is None:
+                self._building.pop(key, None)
+                raise web.HTTPNotFound(text="Registro no encontrado.")
+            if log.get("open"):
+                self._building.pop(key, None)
+                self.bot.metrics.counter("log_viewer_requests_total", result="stream").inc()
+                return await self._stream(request, log)
+
+            # Closed before transcripts were stored, store one for next time
+            self.bot.transcripts.schedule(log)
+            if len(log.get("messages") or ()) > self.stream_threshold:
+                self._building.pop(key, None)
+                self.bot.metrics.counter("log_viewer_requests_total", result="stream").inc()
+                return await self._stream(request, log)
+
+            try:
+                page = await self.bot.loop.run_in_executor(None, build_page, log)
+            except BaseException:
+                self._building.pop(key, None)
+                raise
+            self.bot.metrics.counter("log_viewer_requests_total", result="miss").inc()
+
+        if not self._building.pop(key, True):
+            self._remember(key, page)
+        return self._respond(request, page)
+
+    def _respond(
+        self, request: web.Request, page: CachedPage, content_type: str = "text/html"
+    ) -> web.Response:
+        headers = {"ETag": page.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            if page.etag in (tag.strip() for tag in if_none_match.split(",")):
+                return web.Response(status=304, headers=headers)
+        elif (
+            page.last_modified is not None
+            and request.if_modified_since is not None
+            and request.if_modified_since >= page.last_modified
+        ):
+            return web.Response(status=304, headers=headers)
+
+        encoding = self._encoding(request, page)
+        if encoding == "br":
+            body = page.brotli
+        elif encoding == "gzip":
+            body = page.gzip
+        else:
+            body = page.body
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+        response = web.Response(
+            body=body, content_type=content_type, charset="utf-8", headers=headers
+        )
+        if page.last_modified is not None:
+            response.last_modified = page.last_modified
+        return response
+
+    async def _stream(self, request: web.Request, log: dict) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Cache-Control": "no-store"})
+        response.content_type = "text/html"
+        response.charset = "utf-8"
+        response.enable_compression()
+        await response.prepare(request)
+        for chunk in render_transcript(log):
+            await response.write(chunk.encode("utf-8"))
+        await response.write_eof()
+        return response
@@ -224,6 +224,59 @@ class EmbedPaginatorSession(PaginatorSession):
         await self.base.edit(embed=page)
 
 
+class CursorPaginatorSession(EmbedPaginatorSession):
+    """
+    An `EmbedPaginatorSession` that loads its pages in batches, when they're reached.
+
+    Parameters
+    ----------
+    ctx : Context
+        The context of the command.
+    fetch : Callable[[], Awaitable[List[Embed]]]
+        Returns the next batch of pages, an empty list once there are no more.
+    """
+
+    def __init__(
+        self,
+        ctx: commands.Context,
+        fetch: typing.Callable[[], typing.Awaitable[typing.List[Embed]]],
+        **options,
+    ):
+        super().__init__(ctx, **options)
+        self.fetch = fetch
+        self.exhausted = False
+
+    def add_page(self, item: Embed) -> None:
+        super().add_page(item)
+        footer_text = f"Página {len(self.pages)}"
+        if item.footer.text:
+            footer_text = footer_text + " • " + item.footer.text
+        item.set_footer(text=footer_text, icon_url=item.footer.icon_url)
+
+    async def load_more(self) -> None:
+        """Loads the next batch of pages."""
+        if self.exhausted:
+            return
+        embeds = await self.fetch()
+        if not embeds:
+            self.exhausted = True
+        for embed in embeds:
+            self.add_page(embed)
+
+    async def show_page(self, index: int) -> None:
+        while index >= len(self.pages) and not self.exhausted:
+            await self.load_more()
+        await super().show_page(index)
+
+    async def run(self) -> typing.Optional[Message]:
+        # Reactions are only added when there's more than one page
+        while len(self.pages) < 2 and not self.exhausted:
+            await self.load_more()
+        if not self.pages:
+            return None
+        return await super().run()
+
+
 class MessagePaginatorSession(PaginatorSession):
     def __init__(self, ctx: commands.Context, *messages, embed: Embed = None, **options):
         self.embed = embed
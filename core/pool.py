@@ -0,0 +1,140 @@
+import asyncio
+import secrets
+import typing
+
+import discord
+from discord.ext import tasks
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+POOL_TOPIC = "Modmail pool channel"
+
+
+class ChannelPool:
+    """
+    Keeps a number of hidden, pre-created channels in the main category so a new
+    thread only needs a single channel edit instead of a channel create.
+
+    The pool size is set with the `channel_pool_size` config, 0 disables the pool.
+    Pool channels are recognised by their topic, so they survive restarts.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.channels = []
+        self.claimed = 0
+        self.task = None
+        self._discovered = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def target_size(self) -> int:
+        return self.bot.config.get("channel_pool_size")
+
+    def __len__(self):
+        return len(self.channels)
+
+    @property
+    def available(self) -> int:
+        """The number of channels a new thread can claim."""
+        return len(self.channels) if self.target_size > 0 else 0
+
+    def start(self) -> None:
+        """Starts the refill loop, does nothing if it's already running."""
+        if self.task is not None:
+            return
+        self.task = tasks.Loop(
+            self.refill, seconds=0, minutes=1, hours=0, count=None, reconnect=True, loop=None
+        )
+        self.task.before_loop(self.bot.wait_for_connected)
+        self.task.start()
+
+    def _discover(self, category: discord.CategoryChannel) -> None:
+        known = {c.id for c in self.channels}
+        for channel in category.text_channels:
+            if channel.topic == POOL_TOPIC and channel.id not in known:
+                self.channels.append(channel)
+        self._discovered = True
+        logger.debug("Found %d pooled channel(s).", len(self.channels))
+
+    async def refill(self) -> None:
+        """
+        Creates pool channels until the pool reaches its target size. Errors are
+        logged so the refill loop keeps running.
+        """
+        try:
+            await self._refill()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.error("Failed to refill the channel pool.", exc_info=True)
+
+    async def _refill(self) -> None:
+        category = self.bot.main_category
+        if category is None:
+            return
+        async with self._lock:
+            if not self._discovered:
+                self._discover(category)
+            self.channels = [c for c in self.channels if self.bot.get_channel(c.id) is not None]
+
+            overwrites = {
+                self.bot.modmail_guild.default_role: discord.PermissionOverwrite(
+                    read_messages=False
+                ),
+                self.bot.modmail_guild.me: discord.PermissionOverwrite(read_messages=True),
+            }
+            categories = self.bot.categories
+            # Pool channels count against the category limit too
+            while (
+                len(self.channels) < self.target_size
+                and categories.used(category) < categories.limit
+            ):
+                try:
+                    channel = await self.bot.modmail_guild.create_text_channel(
+                        name=f"pool-{secrets.token_hex(3)}",
+                        category=category,
+                        overwrites=overwrites,
+                        topic=POOL_TOPIC,
+                        reason="Pre-creating a thread channel.",
+                    )
+                except discord.HTTPException as e:
+                    logger.warning("Failed to create a pool channel: %s.", e)
+                    break
+                self.channels.append(channel)
+                # Don't wait for the gateway event to count it
+                categories.on_channel_create(channel)
+            self.bot.metrics.gauge("channel_pool_size").set(len(self.channels))
+
+    async def claim(self, *, name: str, topic: str) -> typing.Optional[discord.TextChannel]:
+        """
+        Takes a channel out of the pool and turns it into a thread channel.
+
+        Returns
+        -------
+        Optional[TextChannel]
+            The renamed channel, or `None` if the pool is empty or disabled.
+        """
+        while self.channels and self.target_size > 0:
+            channel = self.channels.pop(0)
+            if self.bot.get_channel(channel.id) is None:
+                continue
+            try:
+                await channel.edit(
+                    name=name, topic=topic, sync_permissions=True, reason="Creating a thread."
+                )
+            except discord.HTTPException as e:
+                logger.warning("Failed to claim pool channel %s: %s.", channel.id, e)
+                continue
+            self.claimed += 1
+            self.bot.metrics.gauge("channel_pool_size").set(len(self.channels))
+            self.bot.loop.create_task(self.refill())
+            return channel
+        return None
@@ -0,0 +1,177 @@
+import asyncio
+import typing
+from datetime import datetime
+
+from discord.ext import tasks
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class ThreadReconciler:
+    """
+    Background task that brings the thread cache, pending closures and open logs
+    in line with what exists on Discord.
+
+    The first pass runs as soon as the bot is ready, later passes run every
+    `interval` minutes to catch drift. Pending closures are only rescheduled on
+    the first pass, they are tracked in memory afterwards.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    concurrency : int
+        The maximum number of Discord requests made at once.
+    interval : float
+        The time between two passes, in minutes.
+    """
+
+    def __init__(self, bot, *, concurrency: int = 8, interval: float = 15):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.interval = interval
+        self.runs = 0
+        self.last_run = None
+        self.last_duration = None
+        self.task = None
+
+    def start(self) -> None:
+        """Starts the reconcile loop, does nothing if it's already running."""
+        if self.task is not None:
+            return
+        self.task = tasks.Loop(
+            self.reconcile,
+            seconds=0,
+            minutes=self.interval,
+            hours=0,
+            count=None,
+            reconnect=True,
+            loop=None,
+        )
+        self.task.before_loop(self.bot.wait_for_connected)
+        self.task.start()
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _gather(self, coros: typing.Iterable[typing.Awaitable]) -> list:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
+
+    def _guild_ready(self) -> bool:
+        # Channels can't be told apart from deleted ones while the cache is (re)built
+        guild = self.bot.modmail_guild
+        return self.bot.is_ready() and guild is not None and not guild.unavailable
+
+    async def reconcile(self) -> None:
+        """Runs a pass, errors are logged so later passes still run."""
+        try:
+            await self._reconcile()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.error("Failed to reconcile threads.", exc_info=True)
+
+    async def _reconcile(self) -> None:
+        if not self._guild_ready():
+            logger.debug("Skipping reconciling threads, the guild isn't available.")
+            return
+
+        started = self.bot.loop.time()
+        logger.debug("Reconciling threads (pass %d).", self.runs + 1)
+
+        await self.populate_cache()
+        if self.runs == 0:
+            await self.schedule_closures()
+        if self._guild_ready():
+            await self.close_orphaned_logs()
+
+        self.runs += 1
+        self.last_run = datetime.utcnow()
+        self.last_duration = self.bot.loop.time() - started
+        logger.debug("Reconciled threads in %.2f seconds.", self.last_duration)
+
+    async def populate_cache(self) -> None:
+        results = await self._gather(
+            self.bot.threads.find(channel=channel)
+            for channel in self.bot.modmail_guild.text_channels
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Failed to resolve a thread channel: %s.", result)
+
+    async def schedule_closures(self) -> None:
+        closures = self.bot.config["closures"]
+        logger.info("There are %d thread(s) pending to be closed.", len(closures))
+        logger.line()
+
+        results = await self._gather(
+            self._schedule_closure(recipient_id, items)
+            for recipient_id, items in tuple(closures.items())
+        )
+        if any(result is False for result in results):
+            await self.bot.config.update()
+
+    async def _schedule_closure(self, recipient_id: str, items: dict) -> bool:
+        after = (datetime.fromisoformat(items["time"]) - datetime.utcnow()).total_seconds()
+        if after <= 0:
+            logger.debug("Closing thread for recipient %s.", recipient_id)
+            after = 0
+        else:
+            logger.debug(
+                "Thread for recipient %s will be closed after %s seconds.", recipient_id, after
+            )
+
+        thread = await self.bot.threads.find(recipient_id=int(recipient_id))
+
+        if not thread:
+            # If the channel is deleted
+            logger.debug("Failed to close thread for recipient %s.", recipient_id)
+            self.bot.config["closures"].pop(recipient_id, None)
+            return False
+
+        await thread.close(
+            closer=self.bot.get_user(items["closer_id"]),
+            after=after,
+            silent=items["silent"],
+            delete_channel=items["delete_channel"],
+            message=items["message"],
+            auto_close=items.get("auto_close", False),
+        )
+        return True
+
+    async def close_orphaned_logs(self) -> None:
+        orphaned = [
+            log["channel_id"]
+            for log in await self.bot.api.get_open_logs(projection={"channel_id": 1})
+            if self.bot.get_channel(int(log["channel_id"])) is None
+        ]
+        if not orphaned:
+            return
+
+        logger.debug("Unable to resolve threads with channels %s.", ", ".join(orphaned))
+        closed = await self.bot.api.close_logs(
+            orphaned,
+            {
+                "open": False,
+                "closed_at": str(datetime.utcnow()),
+                "close_message": "Channel has been deleted, no closer found.",
+                "closer": {
+                    "id": str(self.bot.user.id),
+                    "name": self.bot.user.name,
+                    "discriminator": self.bot.user.discriminator,
+                    "avatar_url": str(self.bot.user.avatar_url),
+                    "mod": True,
+                },
+            },
+        )
+        logger.debug("Closed %d of %d orphaned log(s).", closed, len(orphaned))
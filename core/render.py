@@ -0,0 +1,203 @@
+import re
+import typing
+from enum import Enum
+
+import discord
+
+__all__ = ["MAX_EMBEDS", "RelayMode", "RenderConfig", "RenderedRelay", "render_relay"]
+
+# The most embeds Discord allows in a single message
+MAX_EMBEDS = 10
+
+SYSTEM_AVATAR_URL = "https://discordapp.com/assets/f78426a064bc9dd24847519259bc42af.png"
+
+URL_PATTERN = re.compile(
+    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+)
+# Same check as core.utils.is_image_url for http(s) URLs, without splitting the URL
+IMAGE_URL_PATTERN = re.compile(
+    r"^https?://[^/?#]*/[^?#]*\.(?:png|jpg|gif|jpeg|webp)(?:[?#]|$)", re.IGNORECASE
+)
+
+
+class RelayMode(Enum):
+    """How a relayed message is shown."""
+
+    RECIPIENT = "recipient"
+    """A message from the recipient, relayed to the thread channel."""
+    REPLY = "reply"
+    """A reply from a moderator."""
+    ANONYMOUS = "anonymous"
+    """An anonymous reply from a moderator."""
+    NOTE = "note"
+    """A note, only shown in the thread channel."""
+
+
+class RenderConfig(typing.NamedTuple):
+    """The config values used to render a message, read once per message."""
+
+    mod_tag: typing.Optional[str]
+    anon_username: typing.Optional[str]
+    anon_avatar_url: typing.Optional[str]
+    anon_tag: str
+    main_color: int
+    mod_color: int
+    recipient_color: int
+    guild_id: int
+    guild_icon_url: str
+
+    @classmethod
+    def from_bot(cls, bot) -> "RenderConfig":
+        return cls(
+            mod_tag=bot.config["mod_tag"],
+            anon_username=bot.config["anon_username"],
+            anon_avatar_url=bot.config["anon_avatar_url"],
+            anon_tag=bot.config["anon_tag"],
+            main_color=bot.main_color,
+            mod_color=bot.mod_color,
+            recipient_color=bot.recipient_color,
+            guild_id=bot.guild.id,
+            guild_icon_url=str(bot.guild.icon_url),
+        )
+
+
+class RenderedRelay(typing.NamedTuple):
+    """
+    The embeds of a relayed message.
+
+    `embed` is shown in the thread channel and `recipient_embed` in the
+    recipient's DM, they are the same object unless the reply is anonymous.
+    `additional` holds an embed for every image upload after the first.
+    `groups` maps attachment URLs to the index of the message they are sent
+    in, when the embeds are split with `batches`.
+    """
+
+    embed: discord.Embed
+    recipient_embed: discord.Embed
+    additional: typing.List[discord.Embed]
+    groups: typing.Dict[str, int]
+    group_size: int
+
+    def batches(self, embed: discord.Embed) -> typing.List[typing.List[discord.Embed]]:
+        """Splits `embed` and the additional embeds into the messages to send."""
+        first = self.group_size - 1
+        batches = [[embed, *self.additional[:first]]]
+        for i in range(first, len(self.additional), self.group_size):
+            batches.append(self.additional[i : i + self.group_size])
+        return batches
+
+
+def _mod_tag(message: discord.Message, config: RenderConfig) -> str:
+    if config.mod_tag is None:
+        return str(message.author.top_role)
+    return config.mod_tag
+
+
+def render_relay(
+    message: discord.Message, mode: RelayMode, config: RenderConfig, group_size: int = MAX_EMBEDS
+) -> RenderedRelay:
+    """
+    Builds the embeds for relaying `message`.
+
+    This only reads `message` and `config`, so it can be called once per
+    message and the result reused for every destination.
+
+    Parameters
+    ----------
+    message : Message
+        The message to relay.
+    mode : RelayMode
+        How the message is shown.
+    config : RenderConfig
+        The config values to render with.
+    group_size : int
+        The number of embeds sent in one message, the main embed included.
+
+    Returns
+    -------
+    RenderedRelay
+        The rendered embeds.
+    """
+    author = message.author
+    content = message.content
+
+    embed = discord.Embed(description=content, timestamp=message.created_at)
+
+    if mode is RelayMode.NOTE:
+        # Special note messages
+        embed.set_author(
+            name=f"Note ({author.name})",
+            icon_url=SYSTEM_AVATAR_URL,
+            url=f"https://discordapp.com/users/{author.id}#{message.id}",
+        )
+        color = config.main_color
+    else:
+        # Normal message
+        embed.set_author(
+            name=str(author),
+            icon_url=author.avatar_url,
+            url=f"https://discordapp.com/users/{author.id}#{message.id}",
+        )
+        color = config.recipient_color if mode is RelayMode.RECIPIENT else config.mod_color
+
+    images = []
+    attachments = []
+    for attachment in message.attachments:
+        if IMAGE_URL_PATTERN.match(attachment.url):
+            images.append((attachment.url, attachment.filename))
+        else:
+            attachments.append((attachment.url, attachment.filename))
+
+    if "http" in content:
+        images.extend(
+            (url, None) for url in URL_PATTERN.findall(content) if IMAGE_URL_PATTERN.match(url)
+        )
+
+    embedded_image = False
+    prioritize_uploads = any(filename is not None for _, filename in images)
+
+    additional = []
+    groups = {}
+    for url, filename in images:
+        if not prioritize_uploads or (not embedded_image and filename):
+            embed.set_image(url=url)
+            if filename:
+                embed.add_field(name="Image", value=f"[{filename}]({url})")
+            embedded_image = True
+        elif filename is not None:
+            img_embed = discord.Embed(color=color, title=filename, url=url)
+            img_embed.set_image(url=url)
+            img_embed.set_footer(text=f"Additional Image Upload ({len(additional) + 1})")
+            img_embed.timestamp = message.created_at
+            groups[url] = (len(additional) + 1) // group_size
+            additional.append(img_embed)
+
+    for i, (url, filename) in enumerate(attachments, start=1):
+        embed.add_field(name=f"File upload ({i})", value=f"[{filename}]({url})")
+
+    embed.colour = color
+    if mode is RelayMode.RECIPIENT:
+        embed.set_footer(text=f"Message ID: {message.id}")
+    elif mode is RelayMode.REPLY:
+        embed.set_footer(text=_mod_tag(message, config))
+    elif mode is RelayMode.ANONYMOUS:
+        # Anonymous reply sent in thread channel
+        embed.set_footer(text="Anonymous Reply")
+
+    recipient_embed = embed
+    if mode is RelayMode.ANONYMOUS:
+        # The recipient doesn't get to see who replied
+        tag = _mod_tag(message, config)
+        recipient_embed = embed.copy()
+        recipient_embed.set_author(
+            name=config.anon_username if config.anon_username is not None else tag,
+            icon_url=(
+                config.anon_avatar_url
+                if config.anon_avatar_url is not None
+                else config.guild_icon_url
+            ),
+            url=f"https://discordapp.com/channels/{config.guild_id}#{message.id}",
+        )
+        recipient_embed.set_footer(text=config.anon_tag)
+
+    return RenderedRelay(embed, recipient_embed, additional, groups, group_size)
@@ -0,0 +1,170 @@
+import csv
+import io
+import typing
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from core.models import getLogger
+
+__all__ = ["COUNTERS", "REPLY_TYPES", "SupportStats", "format_seconds"]
+
+logger = getLogger(__name__)
+
+DAY_FORMAT = "%Y-%m-%d"
+
+# Log message types that count as a moderator replying to the recipient
+REPLY_TYPES = ("thread_message", "anonymous", "anónimo")
+
+COUNTERS = (
+    "opened",
+    "closed",
+    "replies",
+    "responded",
+    "first_response_seconds",
+    "handle_seconds",
+)
+
+
+def _parse(value: typing.Optional[str]) -> typing.Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def format_seconds(seconds: typing.Optional[float]) -> str:
+    """Formats a duration compactly, like `2h 5m` or `40s`."""
+    if seconds is None:
+        return "—"
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    parts = [f"{v}{u}" for v, u in ((days, "d"), (hours, "h"), (minutes, "m")) if v]
+    if not parts:
+        return f"{seconds}s"
+    return " ".join(parts[:2])
+
+
+class SupportStats:
+    """
+    Keeps daily rollups of thread activity, so volume, response times and
+    moderator load can be read without scanning the logs.
+
+    Every day has a counter document for the whole guild, one per moderator and
+    one per category, in the `stats` collection. They are incremented when a
+    log is created, when a moderator replies (the first reply of a thread also
+    records the first response time) and when a thread is closed (recording the
+    handle time). Writes happen in the background and never hold up relaying.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._tasks = set()
+
+    def _schedule(self, at: datetime, updates: typing.List[typing.Tuple[str, str, dict]]) -> None:
+        task = self.bot.loop.create_task(self._write(at.strftime(DAY_FORMAT), updates))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, day: str, updates: typing.List[typing.Tuple[str, str, dict]]) -> None:
+        try:
+            await self.bot.api.update_stats(day, updates)
+        except Exception:
+            logger.error("Failed to update the stats of %s.", day, exc_info=True)
+
+    def record_open(self, log: dict) -> None:
+        """Counts a newly created log."""
+        at = _parse(log.get("created_at")) or datetime.utcnow()
+        updates = [("guild", "", {"opened": 1})]
+        if log.get("category_id"):
+            updates.append(("category", log["category_id"], {"opened": 1}))
+        self._schedule(at, updates)
+
+    def record_reply(self, log: dict, message: dict, first: bool) -> None:
+        """
+        Counts a moderator reply.
+
+        Parameters
+        ----------
+        log : dict
+            The log the reply was appended to.
+        message : dict
+            The reply, as appended to the log.
+        first : bool
+            Whether it's the first moderator reply of the thread.
+        """
+        at = _parse(message.get("timestamp")) or datetime.utcnow()
+        mod_id = message["author"]["id"]
+        updates = [("mod", mod_id, {"replies": 1})]
+
+        created_at = _parse(log.get("created_at"))
+        if first and created_at is not None:
+            inc = {
+                "responded": 1,
+                "first_response_seconds": max((at - created_at).total_seconds(), 0),
+            }
+            updates[0][2].update(inc)
+            updates.append(("guild", "", inc))
+            if log.get("category_id"):
+                updates.append(("category", log["category_id"], inc))
+        self._schedule(at, updates)
+
+    def record_close(self, log: dict) -> None:
+        """Counts a closed log and its handle time."""
+        at = _parse(log.get("closed_at")) or datetime.utcnow()
+        inc = {"closed": 1}
+        created_at = _parse(log.get("created_at"))
+        if created_at is not None:
+            inc["handle_seconds"] = max((at - created_at).total_seconds(), 0)
+
+        updates = [("guild", "", inc)]
+        if log.get("category_id"):
+            updates.append(("category", log["category_id"], inc))
+        closer = log.get("closer") or {}
+        recipient = log.get("recipient") or {}
+        if closer.get("id") and closer["id"] != recipient.get("id"):
+            updates.append(("mod", closer["id"], inc))
+        self._schedule(at, updates)
+
+    async def fetch(self, days: int) -> typing.List[dict]:
+        """The rollups of the last `days` days, today included."""
+        since = (datetime.utcnow() - timedelta(days=days - 1)).strftime(DAY_FORMAT)
+        return await self.bot.api.get_stats(since)
+
+    @staticmethod
+    def summarize(rollups: typing.Iterable[dict]) -> typing.Dict[str, typing.Dict[str, dict]]:
+        """
+        Adds up rollups over their days.
+
+        Returns
+        -------
+        Dict[str, Dict[str, dict]]
+            The counters, by scope (`guild`, `mod` or `category`) and subject ID.
+        """
+        totals = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(COUNTERS, 0)))
+        for rollup in rollups:
+            counters = totals[rollup["scope"]][rollup["subject"]]
+            for name in COUNTERS:
+                counters[name] += rollup.get(name, 0)
+        return totals
+
+    @staticmethod
+    def to_csv(rollups: typing.Iterable[dict]) -> str:
+        """Formats rollups as CSV, one row per day, scope and subject."""
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(("day", "scope", "subject") + COUNTERS)
+        for rollup in sorted(rollups, key=lambda r: (r["day"], r["scope"], r["subject"])):
+            writer.writerow(
+                [rollup["day"], rollup["scope"], rollup["subject"]]
+                + [rollup.get(name, 0) for name in COUNTERS]
+            )
+        return out.getvalue()
@@ -1,6 +1,10 @@
 import asyncio
+import gzip
+import io
 import re
+import time
 import typing
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from types import SimpleNamespace
 
@@ -8,10 +12,14 @@ import isodate
 
 import discord
 from discord.ext.commands import MissingRequiredArgument, CommandError
+from discord.http import Route
 
+from core.flood import edit_merged
 from core.models import getLogger
+from core.render import MAX_EMBEDS, RelayMode, RenderConfig, RenderedRelay, render_relay
 from core.time import human_timedelta
-from core.utils import is_image_url, days, match_user_id, truncate, format_channel_name
+from core.tracing import link, record, span, timed, traced
+from core.utils import days, match_user_id, truncate
 
 logger = getLogger(__name__)
 
@@ -76,8 +84,12 @@ class Thread:
         else:
             self._ready_event.clear()
 
-    async def setup(self, *, creator=None, category=None):
-        """Create the thread channel and other io related initialisation tasks"""
+    @traced("Thread.setup")
+    async def setup(self, *, creator=None, category=None, allocated=None):
+        """
+        Create the thread channel and other io related initialisation tasks.
+        `allocated` is the category slot reserved by the category manager, if any.
+        """
         self.bot.dispatch("thread_initiate", self)
         recipient = self.recipient
 
@@ -91,26 +103,49 @@ class Thread:
         if category is not None:
             overwrites = None
 
+        name = self.bot.channel_names.reserve(recipient)
+        topic = f"User ID: {recipient.id}"
+        started = time.perf_counter()
+
+        channel = error = None
         try:
-            channel = await self.bot.modmail_guild.create_text_channel(
-                name=format_channel_name(recipient, self.bot.modmail_guild),
-                category=category,
-                overwrites=overwrites,
-                reason="Creando categoria de tickets.",
-            )
-        except discord.HTTPException as e:  # Failed to create due to missing perms.
-            logger.critical("Se produjo un error al crear un ticket.", exc_info=True)
-            self.manager.cache.pop(self.id)
+            if category is not None and category == self.bot.main_category:
+                channel = await self.bot.channel_pool.claim(name=name, topic=topic)
+            source = "pool" if channel is not None else "create"
 
+            if channel is None:
+                try:
+                    channel = await self.bot.modmail_guild.create_text_channel(
+                        name=name,
+                        category=category,
+                        overwrites=overwrites,
+                        topic=topic,
+                        reason="Creando categoria de tickets.",
+                    )
+                except discord.HTTPException as e:  # Failed to create due to missing perms.
+                    logger.critical("Se produjo un error al crear un ticket.", exc_info=True)
+                    self.manager.cache.pop(self.id)
+                    error = e
+        finally:
+            # Give back the reservations however this ended, even if cancelled
+            self.bot.channel_names.release(name, channel)
+            if allocated is not None:
+                self.bot.categories.release(allocated, channel)
+
+        if channel is None:
             embed = discord.Embed(color=self.bot.error_color)
             embed.title = "Error al intentar crear un ticket"
-            embed.description = str(e)
+            embed.description = str(error)
             embed.add_field(name="Recipient", value=recipient.mention)
 
             if self.bot.log_channel is not None:
                 await self.bot.log_channel.send(embed=embed)
             return
 
+        self.bot.metrics.histogram("thread_channel_seconds", source=source).record(
+            time.perf_counter() - started
+        )
+
         self._channel = channel
 
         try:
@@ -125,7 +160,6 @@ class Thread:
             log_url = log_count = None
             # ensure core functionality still works
 
-        await channel.edit(topic=f"User ID: {recipient.id}")
         self.ready = True
 
         if creator:
@@ -208,7 +242,9 @@ class Thread:
 
         created = str((time - user.created_at).days)
         embed = discord.Embed(
-            color=color, description=f"{user.mention} fue creado hace: {days(created)}", timestamp=time
+            color=color,
+            description=f"{user.mention} fue creado hace: {days(created)}",
+            timestamp=time,
         )
 
         # if not role_names:
@@ -288,6 +324,7 @@ class Thread:
         else:
             await self._close(closer, silent, delete_channel, message)
 
+    @traced("Thread._close", key=lambda self, *args, **kwargs: self.channel.id)
     async def _close(
         self, closer, silent=False, delete_channel=True, message=None, scheduled=False
     ):
@@ -298,30 +335,44 @@ class Thread:
             return
 
         await self.cancel_closure(all=True)
+        self.bot.typing_relay.forget(self.id)
 
         # Cancel auto closing the thread if closed by any means.
 
         self.bot.config["subscriptions"].pop(str(self.id), None)
         self.bot.config["notification_squad"].pop(str(self.id), None)
 
-        # Logging
-        log_data = await self.bot.api.post_log(
-            self.channel.id,
-            {
-                "open": False,
-                "closed_at": str(datetime.utcnow()),
-                "close_message": message if not silent else None,
-                "closer": {
-                    "id": str(closer.id),
-                    "name": closer.name,
-                    "discriminator": closer.discriminator,
-                    "avatar_url": str(closer.avatar_url),
-                    "mod": True,
+        # Logging, with every journaled message applied first so the log is complete
+        with span("journal.drain"):
+            drained = await self.bot.journal.drain(timeout=10)
+        if not drained:
+            logger.warning("Closing thread %s with journaled messages still pending.", self.id)
+        with span("post_log"):
+            log_data = await self.bot.api.post_log(
+                self.channel.id,
+                {
+                    "open": False,
+                    "closed_at": str(datetime.utcnow()),
+                    "close_message": message if not silent else None,
+                    "closer": {
+                        "id": str(closer.id),
+                        "name": closer.name,
+                        "discriminator": closer.discriminator,
+                        "avatar_url": str(closer.avatar_url),
+                        "mod": True,
+                    },
                 },
-            },
-        )
+            )
 
+        transcript = None
         if isinstance(log_data, dict):
+            self.bot.stats.record_close(log_data)
+            if self.bot.config.get("attach_transcript"):
+                with span("transcripts.create"):
+                    transcript = await self.bot.transcripts.create(log_data)
+            else:
+                self.bot.transcripts.schedule(log_data)
+
             prefix = self.bot.config["log_url_prefix"].strip("/")
             if prefix == "NONE":
                 prefix = ""
@@ -361,7 +412,12 @@ class Thread:
         tasks = [self.bot.config.update()]
 
         if self.bot.log_channel is not None:
-            tasks.append(self.bot.log_channel.send(embed=embed))
+            file = None
+            if transcript is not None:
+                body = gzip.decompress(transcript.html)
+                if len(body) <= 8 * 1024 * 1024:
+                    file = discord.File(io.BytesIO(body), filename=f"{transcript.key}.html")
+            tasks.append(self.bot.log_channel.send(embed=embed, file=file))
 
         # Thread closed message
 
@@ -391,7 +447,8 @@ class Thread:
         if delete_channel:
             tasks.append(self.channel.delete())
 
-        await asyncio.gather(*tasks)
+        with span("notify"):
+            await asyncio.gather(*tasks)
 
     async def cancel_closure(self, auto_close: bool = False, all: bool = False) -> None:
         if self.close_task is not None and (not auto_close or all):
@@ -444,6 +501,10 @@ class Thread:
             closer=self.bot.user, after=int(seconds), message=close_message, auto_close=True
         )
 
+    async def _relayed_by_bot(self, message: discord.Message) -> bool:
+        """Whether `message` was sent by the bot, or by the webhook relaying to this thread."""
+        return message.author == self.bot.user or await self.bot.webhooks.owns(message)
+
     async def find_linked_messages(
         self,
         message_id: typing.Optional[int] = None,
@@ -455,7 +516,7 @@ class Thread:
             if (
                 not message1.embeds
                 or not message1.embeds[0].author.url
-                or message1.author != self.bot.user
+                or not await self._relayed_by_bot(message1)
             ):
                 raise ValueError("Mensaje de ticket con formato incorrecto.")
 
@@ -469,7 +530,7 @@ class Thread:
                 message1.embeds
                 and message1.embeds[0].author.url
                 and message1.embeds[0].color
-                and message1.author == self.bot.user
+                and await self._relayed_by_bot(message1)
             ):
                 raise ValueError("Mensaje del ticket no encontrado.")
 
@@ -498,7 +559,7 @@ class Thread:
                         )
                     )
                     and message1.embeds[0].author.url.split("#")[-1].isdigit()
-                    and message1.author == self.bot.user
+                    and await self._relayed_by_bot(message1)
                 ):
                     break
             else:
@@ -562,6 +623,10 @@ class Thread:
         else:
             compare_url = None
 
+        # DMs held back by flood control were relayed under the ID of the last one
+        merged = self.bot.flood_control.merged(message.id)
+        message_id = merged.id if merged is not None else message.id
+
         async for linked_message in self.channel.history():
             if not linked_message.embeds:
                 continue
@@ -575,7 +640,7 @@ class Thread:
             if not msg_id.isdigit():
                 continue
             msg_id = int(msg_id)
-            if int(msg_id) == message.id:
+            if int(msg_id) == message_id:
                 return linked_message
         raise ValueError("Mensaje del ticket no encontrado.")
 
@@ -585,12 +650,20 @@ class Thread:
         except ValueError:
             logger.warning("Failed to edit message.", exc_info=True)
             raise
+        message_id = message.id
+        merged = self.bot.flood_control.merged(message.id)
+        if merged is not None:
+            # Only this DM's part of the merged message changed
+            message_id = merged.id
+            content = edit_merged(merged, message.id, content)
         embed = linked_message.embeds[0]
         embed.add_field(name="**Mensaje anterior editado:**", value=embed.description)
         embed.description = content
-        await asyncio.gather(
-            self.bot.api.edit_message(message.id, content), linked_message.edit(embed=embed)
-        )
+        if linked_message.webhook_id is not None:
+            edit = self.bot.webhooks.edit_message(linked_message, embed=embed)
+        else:
+            edit = linked_message.edit(embed=embed)
+        await asyncio.gather(self.bot.api.edit_message(message_id, content), edit)
 
     async def note(self, message: discord.Message) -> None:
         if not message.content and not message.attachments:
@@ -606,6 +679,7 @@ class Thread:
 
         return msg
 
+    @traced("Thread.reply", key=lambda self, message, *args, **kwargs: message.id)
     async def reply(self, message: discord.Message, anonymous: bool = False) -> None:
         if not message.content and not message.attachments:
             raise MissingRequiredArgument(SimpleNamespace(name="msg"))
@@ -618,14 +692,64 @@ class Thread:
                 )
             )
 
-        tasks = []
+        timings = {}
+        started = time.perf_counter()
 
-        try:
-            await self.send(
-                message, destination=self.recipient, from_mod=True, anonymous=anonymous
+        def stage(name):
+            nonlocal started
+            now = time.perf_counter()
+            timings[name] = now - started
+            self.bot.metrics.histogram("reply_stage_seconds", stage=name).record(timings[name])
+            record(name, timings[name])
+            started = now
+
+        if not self.ready:
+            await self.wait_until_ready()
+        self.bot.loop.create_task(self._restart_close_timer())
+        stage("ready")
+
+        # The embed is built once, the recipient's copy only differs when anonymous
+        rendered = render_relay(
+            message,
+            RelayMode.ANONYMOUS if anonymous else RelayMode.REPLY,
+            RenderConfig.from_bot(self.bot),
+            self._group_size,
+        )
+        stage("build")
+
+        if self.bot.config.get("reply_typing"):
+            await asyncio.gather(
+                self.recipient.trigger_typing(),
+                self.channel.trigger_typing(),
+                return_exceptions=True,
             )
-        except Exception:
-            logger.error("Error en la entrega del mensaje:", exc_info=True)
+            stage("typing")
+
+        if self.bot.config["dm_disabled"] == 2:
+            logger.info("Sending a message to %s when DM disabled is set.", self.recipient)
+
+        dm_result, channel_result = await asyncio.gather(
+            timed(
+                "send:recipient",
+                self._deliver(self.recipient, rendered.recipient_embed, rendered),
+            ),
+            timed("send:channel", self._deliver(self.channel, rendered.embed, rendered)),
+            return_exceptions=True,
+        )
+        stage("send")
+
+        delivered = not isinstance(dm_result, Exception)
+        if delivered and not isinstance(channel_result, Exception) and not message.attachments:
+            # The channel copy replaces the command message, deleting it doesn't hold up the reply
+            self.bot.loop.create_task(self._delete_message(message))
+
+        tasks = []
+
+        if not delivered:
+            logger.error("Error en la entrega del mensaje:", exc_info=dm_result)
+            if not isinstance(channel_result, Exception):
+                # Don't leave a copy of a message the recipient never got
+                tasks.append(self._delete_message(channel_result))
             tasks.append(
                 message.channel.send(
                     embed=discord.Embed(
@@ -637,18 +761,25 @@ class Thread:
                     )
                 )
             )
-        else:
-            # Send the same thing in the thread channel.
-            msg = await self.send(
-                message, destination=self.channel, from_mod=True, anonymous=anonymous
+        elif isinstance(channel_result, Exception):
+            # The recipient got it, keep the command message as the channel's copy and log it
+            await self.bot.api.append_log(
+                message,
+                message_id=message.id,
+                channel_id=self.channel.id,
+                type_="anónimo" if anonymous else "thread_message",
+                groups=rendered.groups,
             )
-
+            raise channel_result
+        else:
+            link(channel_result.id)
             tasks.append(
                 self.bot.api.append_log(
                     message,
-                    message_id=msg.id,
+                    message_id=channel_result.id,
                     channel_id=self.channel.id,
                     type_="anónimo" if anonymous else "thread_message",
+                    groups=rendered.groups,
                 )
             )
 
@@ -665,7 +796,89 @@ class Thread:
                 )
 
         await asyncio.gather(*tasks)
+        stage("log")
+
+        if delivered:
+            self.bot.metrics.counter("relay_messages_total", direction="to_recipient").inc()
+            self.bot.metrics.histogram("relay_seconds", direction="to_recipient").record(
+                sum(timings.values())
+            )
+        logger.debug(
+            "Reply in %s took %s.",
+            self.channel,
+            ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in timings.items()),
+        )
+
+    @staticmethod
+    async def _delete_message(message: discord.Message) -> None:
+        try:
+            await message.delete()
+        except Exception as e:
+            logger.warning("Cannot delete message: %s.", e)
+
+    @property
+    def _group_size(self) -> int:
+        return MAX_EMBEDS if self.manager.group_embeds else 1
 
+    async def _deliver(
+        self,
+        destination: discord.abc.Messageable,
+        embed: discord.Embed,
+        rendered: RenderedRelay,
+        content: str = None,
+    ) -> discord.Message:
+        """
+        Sends `embed` and the additional image embeds of `rendered` in as few
+        messages as possible, returns the message with `embed`.
+        """
+        batches = rendered.batches(embed)
+        if len(batches) == 1 and len(batches[0]) == 1:
+            # Nothing to group, skip resolving the channel
+            self.bot.metrics.histogram("relay_rest_calls").record(1)
+            return await destination.send(content, embed=embed)
+
+        if isinstance(destination, (discord.User, discord.Member)):
+            channel = destination.dm_channel or await destination.create_dm()
+        else:
+            channel = destination
+
+        msg, calls = await self._send_embeds(channel, batches[0], content)
+        results = await asyncio.gather(*(self._send_embeds(channel, b) for b in batches[1:]))
+        calls += sum(n for _, n in results)
+        self.bot.metrics.histogram("relay_rest_calls").record(calls)
+        return msg
+
+    async def _send_embeds(
+        self,
+        channel: typing.Union[discord.TextChannel, discord.DMChannel],
+        embeds: typing.List[discord.Embed],
+        content: str = None,
+    ) -> typing.Tuple[discord.Message, int]:
+        """Sends up to `MAX_EMBEDS` embeds in one message, returns it and the REST calls made."""
+        if len(embeds) == 1:
+            return await channel.send(content, embed=embeds[0]), 1
+        if not self.manager.group_embeds:
+            msg = await channel.send(content, embed=embeds[0])
+            await asyncio.gather(*(channel.send(embed=e) for e in embeds[1:]))
+            return msg, len(embeds)
+
+        payload = {"embeds": [e.to_dict() for e in embeds]}
+        if content:
+            payload["content"] = content
+        route = Route("POST", "/channels/{channel_id}/messages", channel_id=channel.id)
+        try:
+            data = await self.bot.http.request(route, json=payload)
+        except discord.HTTPException as e:
+            if e.status != 400:
+                raise
+            logger.warning("Discord rejected grouped embeds, sending them one by one: %s.", e)
+            self.manager.group_embeds = False
+            msg = await channel.send(content, embed=embeds[0])
+            await asyncio.gather(*(channel.send(embed=e) for e in embeds[1:]))
+            return msg, 1 + len(embeds)
+        return self.bot._connection.create_message(channel=channel, data=data), 1
+
+    @traced("Thread.send", key=lambda self, message, *args, **kwargs: message.id)
     async def send(
         self,
         message: discord.Message,
@@ -687,148 +900,50 @@ class Thread:
             self.bot.loop.create_task(
                 self.channel.send(
                     embed=discord.Embed(
-                        color=self.bot.error_color,
-                        description="Se canceló el cierre programado.",
+                        color=self.bot.error_color, description="Se canceló el cierre programado.",
                     )
                 )
             )
 
         if not self.ready:
-            await self.wait_until_ready()
-
-        if not from_mod and not note:
-            self.bot.loop.create_task(self.bot.api.append_log(message, channel_id=self.channel.id))
+            with span("wait_until_ready"):
+                await self.wait_until_ready()
 
         destination = destination or self.channel
 
-        author = message.author
-
-        embed = discord.Embed(description=message.content, timestamp=message.created_at)
-
-        system_avatar_url = "https://discordapp.com/assets/f78426a064bc9dd24847519259bc42af.png"
-
-        if not note:
-            if anonymous and from_mod and not isinstance(destination, discord.TextChannel):
-                # Anonymously sending to the user.
-                tag = self.bot.config["mod_tag"]
-                if tag is None:
-                    tag = str(author.top_role)
-                name = self.bot.config["anon_username"]
-                if name is None:
-                    name = tag
-                avatar_url = self.bot.config["anon_avatar_url"]
-                if avatar_url is None:
-                    avatar_url = self.bot.guild.icon_url
-                embed.set_author(
-                    name=name,
-                    icon_url=avatar_url,
-                    url=f"https://discordapp.com/channels/{self.bot.guild.id}#{message.id}",
-                )
-            else:
-                # Normal message
-                name = str(author)
-                avatar_url = author.avatar_url
-                embed.set_author(
-                    name=name,
-                    icon_url=avatar_url,
-                    url=f"https://discordapp.com/users/{author.id}#{message.id}",
-                )
+        if note:
+            mode = RelayMode.NOTE
+        elif not from_mod:
+            mode = RelayMode.RECIPIENT
+        elif anonymous:
+            mode = RelayMode.ANONYMOUS
         else:
-            # Special note messages
-            embed.set_author(
-                name=f"Note ({author.name})",
-                icon_url=system_avatar_url,
-                url=f"https://discordapp.com/users/{author.id}#{message.id}",
-            )
-
-        ext = [(a.url, a.filename) for a in message.attachments]
+            mode = RelayMode.REPLY
+        rendered = render_relay(message, mode, RenderConfig.from_bot(self.bot), self._group_size)
 
-        images = []
-        attachments = []
-        for attachment in ext:
-            if is_image_url(attachment[0]):
-                images.append(attachment)
-            else:
-                attachments.append(attachment)
-
-        image_urls = re.findall(
-            r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+",
-            message.content,
-        )
-
-        image_urls = [(url, None) for url in image_urls if is_image_url(url)]
-        images.extend(image_urls)
-
-        embedded_image = False
-
-        prioritize_uploads = any(i[1] is not None for i in images)
-
-        additional_images = []
-        additional_count = 1
-
-        for url, filename in images:
-            if not prioritize_uploads or (is_image_url(url) and not embedded_image and filename):
-                embed.set_image(url=url)
-                if filename:
-                    embed.add_field(name="Image", value=f"[{filename}]({url})")
-                embedded_image = True
-            elif filename is not None:
-                if note:
-                    color = self.bot.main_color
-                elif from_mod:
-                    color = self.bot.mod_color
-                else:
-                    color = self.bot.recipient_color
-
-                img_embed = discord.Embed(color=color)
-                img_embed.set_image(url=url)
-                img_embed.title = filename
-                img_embed.url = url
-                img_embed.set_footer(text=f"Additional Image Upload ({additional_count})")
-                img_embed.timestamp = message.created_at
-                additional_images.append(destination.send(embed=img_embed))
-                additional_count += 1
-
-        file_upload_count = 1
-
-        for url, filename in attachments:
-            embed.add_field(
-                name=f"File upload ({file_upload_count})", value=f"[{filename}]({url})"
+        if not from_mod and not note:
+            self.bot.loop.create_task(
+                self.bot.api.append_log(
+                    message, channel_id=self.channel.id, groups=rendered.groups
+                )
             )
-            file_upload_count += 1
-
-        if from_mod:
-            embed.colour = self.bot.mod_color
-            # Anonymous reply sent in thread channel
-            if anonymous and isinstance(destination, discord.TextChannel):
-                embed.set_footer(text="Anonymous Reply")
-            # Normal messages
-            elif not anonymous:
-                mod_tag = self.bot.config["mod_tag"]
-                if mod_tag is None:
-                    mod_tag = str(message.author.top_role)
-                embed.set_footer(text=mod_tag)  # Normal messages
-            else:
-                embed.set_footer(text=self.bot.config["anon_tag"])
-        elif note:
-            embed.colour = self.bot.main_color
+
+        if isinstance(destination, discord.TextChannel):
+            embed = rendered.embed
         else:
-            embed.set_footer(text=f"Message ID: {message.id}")
-            embed.colour = self.bot.recipient_color
+            embed = rendered.recipient_embed
 
         if from_mod or note:
             delete_message = not bool(message.attachments)
             if delete_message and destination == self.channel:
-                try:
-                    await message.delete()
-                except Exception as e:
-                    logger.warning("Cannot delete message: %s.", e)
+                await self._delete_message(message)
 
         if from_mod and self.bot.config["dm_disabled"] == 2 and destination != self.channel:
             logger.info("Sending a message to %s when DM disabled is set.", self.recipient)
 
         try:
-            await destination.trigger_typing()
+            with span("trigger_typing"):
+                await destination.trigger_typing()
         except discord.NotFound:
             logger.warning("Channel not found.")
             raise
@@ -838,13 +953,19 @@ class Thread:
         else:
             mentions = None
 
-        msg = await destination.send(mentions, embed=embed)
-
-        if additional_images:
-            self.ready = False
-            await asyncio.gather(*additional_images)
-            self.ready = True
+        webhooks = self.bot.webhooks
+        if mode is RelayMode.RECIPIENT and destination == self.channel and webhooks.enabled:
+            with span("webhooks.relay"):
+                msg = await webhooks.relay(
+                    self.channel, message.author, rendered.batches(embed), mentions
+                )
+            if msg is not None:
+                link(msg.id)
+                return msg
 
+        with span("destination.send"):
+            msg = await self._deliver(destination, embed, rendered, mentions)
+        link(msg.id)
         return msg
 
     def get_notifications(self) -> str:
@@ -867,6 +988,38 @@ class ThreadManager:
     def __init__(self, bot):
         self.bot = bot
         self.cache = {}
+        self._guards = {}
+        # Turned off if Discord rejects more than one embed per message
+        self.group_embeds = True
+
+    @asynccontextmanager
+    async def guard(self, recipient_id: int):
+        """
+        Serialises finding and creating the thread of one recipient.
+
+        Callers that check for a thread and create it when missing should do both
+        inside this guard, so two of them racing for a new recipient end up with
+        the same thread instead of each doing their own lookups and creation.
+
+        Examples
+        --------
+        ::
+            async with bot.threads.guard(user.id):
+                thread = await bot.threads.find(recipient=user)
+                if thread is None:
+                    thread = await bot.threads.create(user)
+        """
+        entry = self._guards.get(recipient_id)
+        if entry is None:
+            entry = self._guards[recipient_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self._guards.pop(recipient_id, None)
 
     async def populate_cache(self) -> None:
         for channel in self.bot.modmail_guild.text_channels:
@@ -974,24 +1127,21 @@ class ThreadManager:
 
         thread = Thread(self, recipient)
 
+        # Reserve room first, if that fails no thread without a channel is left in the cache
+        if category is None:
+            category = await self.bot.categories.allocate()
+            allocated = category
+        else:
+            allocated = None
+
         self.cache[recipient.id] = thread
 
         # Schedule thread setup for later
-        cat = self.bot.main_category
-        if category is None and len(cat.channels) == 50:
-            fallback_id = self.bot.config["fallback_category_id"]
-            if fallback_id:
-                fallback = discord.utils.get(cat.guild.categories, id=int(fallback_id))
-                if fallback and len(fallback.channels) != 50:
-                    category = fallback
-
-            if not category:
-                category = await cat.clone(name="Fallback RequiemSupport")
-                self.bot.config.set("fallback_category_id", category.id)
-                await self.bot.config.update()
-
-        self.bot.loop.create_task(thread.setup(creator=creator, category=category))
+        self.bot.loop.create_task(
+            thread.setup(creator=creator, category=category, allocated=allocated)
+        )
         return thread
 
     async def find_or_create(self, recipient) -> Thread:
-        return await self.find(recipient=recipient) or await self.create(recipient)
+        async with self.guard(recipient.id):
+            return await self.find(recipient=recipient) or await self.create(recipient)
@@ -0,0 +1,237 @@
+"""
+Lightweight tracing of how long each stage of a relay takes.
+
+A trace is started for a message and the current one is kept in a context
+variable, so it follows the relay through every coroutine and task it starts.
+Stages are timed with `span`, and methods with `traced`::
+
+    with bot.tracer.trace("dm", message.id):
+        with span("is_blocked"):
+            ...
+
+Spans are only recorded while a trace is running, anything else costs a
+context variable lookup.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import time
+import typing
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from core.models import getLogger
+
+__all__ = [
+    "Span",
+    "Trace",
+    "Tracer",
+    "current_trace",
+    "link",
+    "record",
+    "span",
+    "timed",
+    "traced",
+]
+
+logger = getLogger(__name__)
+
+# Stops a trace from growing forever if a long lived task inherited it
+MAX_SPANS = 200
+
+_current = contextvars.ContextVar("trace", default=None)
+_depth = contextvars.ContextVar("trace_depth", default=0)
+
+
+class Span(typing.NamedTuple):
+    name: str
+    # Seconds since the trace started
+    start: float
+    duration: float
+    depth: int
+    error: typing.Optional[str] = None
+
+
+class Trace:
+    """The spans recorded for one relay, `duration` is `None` until it's done."""
+
+    def __init__(self, name: str, key: int):
+        self.trace_id = secrets.token_hex(8)
+        self.name = name
+        self.keys = [key]
+        self.started_at = datetime.utcnow()
+        self.duration = None
+        self.error = None
+        self.spans = []
+        self._started = time.perf_counter()
+
+    def add(self, name: str, started: float, ended: float, depth: int, error: str = None) -> None:
+        """Records a span from `perf_counter` times."""
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(Span(name, started - self._started, ended - started, depth, error))
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "keys": [str(key) for key in self.keys],
+            "started_at": self.started_at.isoformat(),
+            "duration": self.duration,
+            "error": self.error,
+            "spans": [span._asdict() for span in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+
+def current_trace() -> typing.Optional[Trace]:
+    """The trace of the running relay, if any and still running."""
+    trace = _current.get()
+    if trace is None or trace.duration is not None:
+        return None
+    return trace
+
+
+@contextmanager
+def span(name: str):
+    """Times the enclosed block as a stage of the current trace."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _depth.reset(token)
+        trace.add(name, started, time.perf_counter(), depth, error)
+
+
+def record(name: str, duration: float) -> None:
+    """Records a stage of the current trace that ended just now."""
+    trace = current_trace()
+    if trace is not None:
+        ended = time.perf_counter()
+        trace.add(name, ended - duration, ended, _depth.get())
+
+
+async def timed(name: str, awaitable: typing.Awaitable):
+    """Awaits `awaitable` as a span of the current trace, for use in `asyncio.gather`."""
+    with span(name):
+        return await awaitable
+
+
+def link(key: typing.Optional[int]) -> None:
+    """Makes the current trace findable by another message ID too."""
+    trace = current_trace()
+    if trace is not None and key is not None and key not in trace.keys:
+        trace.keys.append(key)
+
+
+def traced(name: str, key: typing.Callable[..., int] = None):
+    """
+    Decorates a coroutine method of an object holding the bot, to time it as a
+    span of the current trace.
+
+    Parameters
+    ----------
+    name : str
+        The name of the span.
+    key : Callable[..., int], optional
+        Called with the method's arguments when there is no current trace, to
+        start one under the ID it returns. Without it, calls outside a trace
+        aren't traced.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            if current_trace() is not None:
+                with span(name):
+                    return await func(self, *args, **kwargs)
+            if key is None:
+                return await func(self, *args, **kwargs)
+            with self.bot.tracer.trace(name, key(self, *args, **kwargs)):
+                return await func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Tracer:
+    """
+    Starts traces and keeps the most recent ones, by the IDs of the messages
+    they relayed.
+
+    Finished traces are also appended to `trace_file` as JSON lines if it's
+    set. Spans of background tasks that end after their trace are only kept in
+    memory.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    capacity : int
+        The number of message IDs traces are kept for.
+    """
+
+    def __init__(self, bot, *, capacity: int = 500):
+        self.bot = bot
+        self.capacity = capacity
+        self._traces = OrderedDict()
+
+    @property
+    def path(self) -> typing.Optional[str]:
+        return self.bot.config["trace_file"]
+
+    def get(self, key: int) -> typing.Optional[Trace]:
+        """The most recent trace of a message."""
+        return self._traces.get(key)
+
+    def _remember(self, trace: Trace) -> None:
+        for key in trace.keys:
+            self._traces[key] = trace
+            self._traces.move_to_end(key)
+        while len(self._traces) > self.capacity:
+            self._traces.popitem(last=False)
+
+    @contextmanager
+    def trace(self, name: str, key: int):
+        """Traces the enclosed block, spans recorded inside it are part of the trace."""
+        trace = Trace(name, key)
+        self._remember(trace)
+        token = _current.set(trace)
+        depth_token = _depth.set(0)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = type(e).__name__
+            raise
+        finally:
+            trace.duration = time.perf_counter() - trace._started
+            _depth.reset(depth_token)
+            _current.reset(token)
+            # Store it again, it may have been linked to more messages
+            self._remember(trace)
+            if self.path:
+                line = json.dumps(trace.to_dict(), separators=(",", ":"))
+                self.bot.loop.run_in_executor(None, self._write, self.path, line)
+
+    @staticmethod
+    def _write(path: str, line: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning("Failed to write a trace to %s: %s.", path, e)
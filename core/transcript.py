@@ -0,0 +1,253 @@
+import asyncio
+import gzip
+import hashlib
+import html
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from core.models import getLogger
+
+__all__ = [
+    "Transcript",
+    "TranscriptManager",
+    "build_transcript",
+    "render_transcript",
+    "render_transcript_html",
+    "render_transcript_text",
+]
+
+logger = getLogger(__name__)
+
+# Messages rendered per chunk when streaming
+CHUNK_MESSAGES = 100
+
+STYLE = """
+body{background:#36393f;color:#dcddde;font-family:Helvetica,Arial,sans-serif;margin:0;padding:24px}
+header{border-bottom:1px solid #4f545c;margin-bottom:16px;padding-bottom:12px}
+h1{font-size:20px;margin:0 0 8px}
+.meta{color:#a3a6aa;font-size:13px;line-height:1.6}
+.message{display:flex;padding:6px 0}
+.message img.avatar{border-radius:50%;height:40px;margin-right:12px;width:40px}
+.author{font-weight:bold}
+.mod .author{color:#43b581}
+.time{color:#72767d;font-size:12px;margin-left:6px}
+.tag{background:#4f545c;border-radius:3px;font-size:10px;margin-left:6px;padding:1px 4px}
+.content{white-space:pre-wrap;word-wrap:break-word}
+.attachment img{border-radius:3px;display:block;max-height:300px;max-width:400px;margin-top:4px}
+.type-internal,.type-system{opacity:.6}
+"""
+
+
+def _e(value: typing.Any) -> str:
+    return html.escape(str(value if value is not None else ""))
+
+
+def _user(user: typing.Optional[dict]) -> str:
+    if not user:
+        return "—"
+    return f"{_e(user.get('name'))}#{_e(user.get('discriminator'))} ({_e(user.get('id'))})"
+
+
+def _time(value: typing.Optional[str]) -> str:
+    if not value:
+        return ""
+    try:
+        return datetime.fromisoformat(value).strftime("%d/%m/%Y %H:%M")
+    except ValueError:
+        return _e(value)
+
+
+def _message(message: dict) -> str:
+    author = message.get("author") or {}
+    type_ = message.get("type", "thread_message")
+    classes = f"message type-{_e(type_)}" + (" mod" if author.get("mod") else "")
+
+    tags = ""
+    if type_ != "thread_message":
+        tags += f'<span class="tag">{_e(type_)}</span>'
+    if message.get("edited"):
+        tags += '<span class="tag">editado</span>'
+
+    attachments = []
+    for attachment in message.get("attachments") or ():
+        url = _e(attachment.get("url"))
+        name = _e(attachment.get("filename"))
+        if attachment.get("is_image"):
+            attachments.append(
+                f'<a class="attachment" href="{url}"><img src="{url}" alt="{name}"></a>'
+            )
+        else:
+            attachments.append(f'<a class="attachment" href="{url}">{name}</a>')
+
+    return (
+        f'<div class="{classes}">'
+        f'<img class="avatar" src="{_e(author.get("avatar_url"))}" alt="">'
+        "<div>"
+        f'<span class="author">{_e(author.get("name"))}</span>'
+        f'<span class="time">{_time(message.get("timestamp"))}</span>{tags}'
+        f'<div class="content">{_e(message.get("content"))}</div>'
+        f'{"".join(attachments)}'
+        "</div></div>"
+    )
+
+
+def render_transcript(log: dict) -> typing.Iterator[str]:
+    """
+    Renders a log document as an HTML page, in chunks so long logs can be
+    streamed without building the whole page first.
+
+    Parameters
+    ----------
+    log : dict
+        The log document, as stored by the `ApiClient`.
+
+    Yields
+    ------
+    str
+        Consecutive parts of the page.
+    """
+    recipient = log.get("recipient") or {}
+    messages = log.get("messages") or []
+
+    yield (
+        '<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">'
+        f"<title>Ticket de {_e(recipient.get('name'))} · {_e(log.get('key'))}</title>"
+        f"<style>{STYLE}</style></head><body><header>"
+        f"<h1>Ticket de {_user(recipient)}</h1>"
+        '<div class="meta">'
+        f"Creado por {_user(log.get('creator'))} el {_time(log.get('created_at'))}<br>"
+    )
+    if log.get("open"):
+        yield "Ticket abierto<br>"
+    else:
+        yield (
+            f"Cerrado por {_user(log.get('closer'))} el {_time(log.get('closed_at'))}<br>"
+            f"{_e(log.get('close_message') or '')}"
+        )
+    yield f"<br>{len(messages)} mensajes</div></header><main>"
+
+    for i in range(0, len(messages), CHUNK_MESSAGES):
+        yield "".join(_message(m) for m in messages[i : i + CHUNK_MESSAGES])
+
+    yield "</main></body></html>"
+
+
+def render_transcript_html(log: dict) -> str:
+    """Renders a log document as a complete HTML page."""
+    return "".join(render_transcript(log))
+
+
+def _text_user(user: typing.Optional[dict]) -> str:
+    if not user:
+        return "-"
+    return f"{user.get('name')}#{user.get('discriminator')} ({user.get('id')})"
+
+
+def render_transcript_text(log: dict) -> str:
+    """Renders a log document as plain text."""
+    lines = [
+        f"Ticket de {_text_user(log.get('recipient'))}",
+        f"Creado por {_text_user(log.get('creator'))} el {_time(log.get('created_at'))}",
+    ]
+    if not log.get("open"):
+        lines.append(
+            f"Cerrado por {_text_user(log.get('closer'))} el {_time(log.get('closed_at'))}"
+        )
+        if log.get("close_message"):
+            lines.append(log["close_message"])
+    lines.append("")
+
+    for message in log.get("messages") or ():
+        author = message.get("author") or {}
+        type_ = message.get("type", "thread_message")
+        header = f"[{_time(message.get('timestamp'))}] {author.get('name')}"
+        if type_ != "thread_message":
+            header += f" ({type_})"
+        if message.get("edited"):
+            header += " (editado)"
+        lines.append(f"{header}: {message.get('content') or ''}")
+        for attachment in message.get("attachments") or ():
+            lines.append(f"    {attachment.get('filename')}: {attachment.get('url')}")
+    return "\n".join(lines) + "\n"
+
+
+class Transcript(typing.NamedTuple):
+    """A rendered log, both formats gzip compressed."""
+
+    key: str
+    html: bytes
+    text: bytes
+    etag: str
+
+
+def build_transcript(log: dict) -> Transcript:
+    """Renders and compresses a log, meant to run in a process pool."""
+    body = render_transcript_html(log).encode("utf-8")
+    return Transcript(
+        key=log["key"],
+        html=gzip.compress(body, 9),
+        text=gzip.compress(render_transcript_text(log).encode("utf-8"), 9),
+        etag='"' + hashlib.sha1(body).hexdigest() + '"',
+    )
+
+
+class TranscriptManager:
+    """
+    Renders the transcript of a log when its thread closes and stores it next to
+    the log, so viewing or exporting a closed log doesn't render it again.
+
+    Rendering runs in a process pool, off the event loop.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    workers : int
+        The number of rendering processes.
+    """
+
+    def __init__(self, bot, *, workers: int = 1):
+        self.bot = bot
+        self.workers = workers
+        self._pool = None
+        self._tasks = set()
+
+    async def render(self, log: dict) -> Transcript:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        started = self.bot.loop.time()
+        try:
+            transcript = await self.bot.loop.run_in_executor(self._pool, build_transcript, log)
+        except BrokenProcessPool:
+            logger.warning("Transcript process pool broke, rendering in a thread.")
+            self._pool = None
+            transcript = await self.bot.loop.run_in_executor(None, build_transcript, log)
+        self.bot.metrics.histogram("transcript_render_seconds").record(
+            self.bot.loop.time() - started
+        )
+        return transcript
+
+    async def create(self, log: dict) -> typing.Optional[Transcript]:
+        """Renders and stores the transcript of a closed log."""
+        try:
+            transcript = await self.render(log)
+            await self.bot.api.save_transcript(transcript)
+        except Exception:
+            logger.error("Failed to create the transcript of log %s.", log["key"], exc_info=True)
+            return None
+        return transcript
+
+    def schedule(self, log: dict) -> None:
+        """Creates the transcript of a closed log in the background."""
+        task = self.bot.loop.create_task(self.create(log))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
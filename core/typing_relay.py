@@ -0,0 +1,89 @@
+import typing
+
+import discord
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class TypingRelay:
+    """
+    Forwards typing indicators between recipients and thread channels.
+
+    A typing indicator lasts about ten seconds on Discord's side, so at most one
+    trigger is sent per thread and direction within `window`. Whether the recipient
+    is blocked is cached for `blocked_ttl` seconds.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    window : float
+        The minimum time, in seconds, between two triggers for the same thread and direction.
+    blocked_ttl : float
+        How long, in seconds, a blocked verdict stays fresh.
+
+    Attributes
+    ----------
+    forwarded : int
+        The number of typing triggers sent.
+    suppressed : int
+        The number of typing triggers skipped because one was recently sent.
+    """
+
+    def __init__(self, bot, *, window: float = 8, blocked_ttl: float = 30):
+        self.bot = bot
+        self.window = window
+        self.blocked_ttl = blocked_ttl
+        self.forwarded = 0
+        self.suppressed = 0
+        self._last_sent = {}
+        self._blocked = {}
+
+    def _claim(self, thread_id: int, direction: str) -> bool:
+        now = self.bot.loop.time()
+        key = (thread_id, direction)
+        if now - self._last_sent.get(key, float("-inf")) < self.window:
+            self.suppressed += 1
+            return False
+        self._last_sent[key] = now
+        return True
+
+    async def _is_blocked(self, user: typing.Union[discord.Member, discord.User]) -> bool:
+        now = self.bot.loop.time()
+        cached = self._blocked.get(user.id)
+        if cached is not None and now - cached[1] < self.blocked_ttl:
+            return cached[0]
+        blocked = await self.bot.is_blocked(user)
+        self._blocked[user.id] = (blocked, now)
+        return blocked
+
+    def forget(self, thread_id: int) -> None:
+        """Drops the state kept for a thread, called when it closes."""
+        self._last_sent.pop((thread_id, "recipient"), None)
+        self._last_sent.pop((thread_id, "mod"), None)
+        self._blocked.pop(thread_id, None)
+
+    async def relay(self, channel: discord.abc.Messageable, user: discord.User) -> None:
+        if isinstance(channel, discord.DMChannel):
+            if not self.bot.config.get("user_typing"):
+                return
+
+            thread = await self.bot.threads.find(recipient=user)
+            if thread and self._claim(thread.id, "recipient"):
+                await thread.channel.trigger_typing()
+                self.forwarded += 1
+        else:
+            if not self.bot.config.get("mod_typing"):
+                return
+
+            thread = await self.bot.threads.find(channel=channel)
+            if thread is None or not thread.recipient:
+                return
+            if not self._claim(thread.id, "mod"):
+                return
+            if await self._is_blocked(thread.recipient):
+                return
+            await thread.recipient.trigger_typing()
+            self.forwarded += 1
@@ -28,6 +28,7 @@ __all__ = [
     "format_description",
     "trigger_typing",
     "escape_code_block",
+    "channel_base_name",
     "format_channel_name",
 ]
 
@@ -302,13 +303,18 @@ def escape_code_block(text):
     return re.sub(r"```", "`\u200b``", text)
 
 
-def format_channel_name(author, guild, exclude_channel=None):
-    """Sanitises a username for use with text channel names"""
+def channel_base_name(author):
+    """Sanitises a username for use with text channel names, without a collision suffix"""
     name = author.name.lower()
-    name = new_name = (
+    return (
         "".join(l for l in name if l not in string.punctuation and l.isprintable()) or "null"
     ) + f"-{author.discriminator}"
 
+
+def format_channel_name(author, guild, exclude_channel=None):
+    """Sanitises a username for use with text channel names"""
+    name = new_name = channel_base_name(author)
+
     counter = 1
     existed = set(c.name for c in guild.text_channels if c != exclude_channel)
     while new_name in existed:
@@ -0,0 +1,173 @@
+import asyncio
+import typing
+
+import discord
+from discord.http import Route
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+WEBHOOK_NAME = "RequiemSupport"
+
+
+class ThreadWebhooks:
+    """
+    Relays recipient messages into thread channels through a webhook per channel.
+
+    Webhook messages show the recipient's name and avatar and don't count
+    towards the bot's own message rate limits. Webhooks are created the first
+    time a channel needs one, their ID is stored in the thread's log so they are
+    reused after a restart. Enabled with the `thread_webhooks` config.
+
+    Parameters
+    ----------
+    bot : Bot
+        The Modmail bot.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._webhooks = {}
+        self._ids = set()
+        self._missing = set()
+        self._locks = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.bot.config.get("thread_webhooks")
+
+    def invalidate(self, channel_id: int) -> None:
+        self._missing.discard(channel_id)
+        webhook = self._webhooks.pop(channel_id, None)
+        if webhook is not None:
+            self._ids.discard(webhook.id)
+
+    def on_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        self.invalidate(channel.id)
+        self._locks.pop(channel.id, None)
+
+    async def get(
+        self, channel: discord.TextChannel, *, create: bool = True
+    ) -> typing.Optional[discord.Webhook]:
+        """
+        The relay webhook of a thread channel.
+
+        Parameters
+        ----------
+        channel : TextChannel
+            The thread channel.
+        create : bool
+            Whether to create the webhook if the channel doesn't have one yet.
+
+        Returns
+        -------
+        Optional[Webhook]
+            The webhook, `None` if there is none and it wasn't created.
+        """
+        if channel.id in self._webhooks:
+            return self._webhooks[channel.id]
+        if not create and channel.id in self._missing:
+            return None
+
+        # Kept until the channel is deleted, a caller waiting on it must not race a new one
+        async with self._locks.setdefault(channel.id, asyncio.Lock()):
+            return await self._resolve(channel, create)
+
+    async def _resolve(
+        self, channel: discord.TextChannel, create: bool
+    ) -> typing.Optional[discord.Webhook]:
+        if channel.id in self._webhooks:
+            return self._webhooks[channel.id]
+
+        webhook = None
+        log = await self.bot.api.get_log(channel.id)
+        if log and log.get("webhook_id"):
+            try:
+                webhook = await self.bot.fetch_webhook(int(log["webhook_id"]))
+            except (discord.NotFound, discord.Forbidden):
+                logger.debug("Stored webhook of channel %s is gone.", channel.id)
+
+        if webhook is None and create:
+            webhook = await channel.create_webhook(
+                name=WEBHOOK_NAME, reason="Relaying thread messages."
+            )
+            await self.bot.api.post_log(channel.id, {"webhook_id": str(webhook.id)})
+            logger.debug("Created webhook for channel %s.", channel.id)
+
+        if webhook is None:
+            self._missing.add(channel.id)
+            return None
+        self._missing.discard(channel.id)
+        self._webhooks[channel.id] = webhook
+        self._ids.add(webhook.id)
+        return webhook
+
+    async def owns(self, message: discord.Message) -> bool:
+        """Whether `message` was sent by the relay webhook of its channel."""
+        if message.webhook_id is None:
+            return False
+        if message.webhook_id not in self._ids:
+            try:
+                await self.get(message.channel, create=False)
+            except discord.HTTPException:
+                return False
+        return message.webhook_id in self._ids
+
+    async def relay(
+        self,
+        channel: discord.TextChannel,
+        author: typing.Union[discord.User, discord.Member],
+        batches: typing.List[typing.List[discord.Embed]],
+        content: str = None,
+    ) -> typing.Optional[discord.Message]:
+        """
+        Sends `batches` of embeds to `channel` as `author`.
+
+        Returns
+        -------
+        Optional[Message]
+            The first message sent, `None` if the webhook couldn't be used and
+            the caller should send the message itself.
+        """
+        try:
+            webhook = await self.get(channel)
+        except discord.HTTPException as e:
+            logger.warning("Failed to get the webhook of channel %s: %s.", channel.id, e)
+            return None
+
+        kwargs = {"username": author.name[:80], "avatar_url": str(author.avatar_url), "wait": True}
+        try:
+            msg = await webhook.send(content, embeds=batches[0], **kwargs)
+        except discord.HTTPException as e:
+            logger.warning("Failed to relay through the webhook of %s: %s.", channel.id, e)
+            if isinstance(e, discord.NotFound):
+                self.invalidate(channel.id)
+            return None
+
+        if len(batches) > 1:
+            results = await asyncio.gather(
+                *(webhook.send(embeds=batch, **kwargs) for batch in batches[1:]),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning("Failed to relay additional images: %s.", result)
+        self.bot.metrics.histogram("relay_rest_calls").record(len(batches))
+        return msg
+
+    async def edit_message(self, message: discord.Message, *, embed: discord.Embed) -> None:
+        """Edits a message sent by the relay webhook."""
+        webhook = await self.get(message.channel, create=False)
+        if webhook is None:
+            raise ValueError("Webhook del ticket no encontrado.")
+        await self.bot.http.request(
+            Route(
+                "PATCH",
+                "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}",
+                webhook_id=webhook.id,
+                webhook_token=webhook.token,
+                message_id=message.id,
+            ),
+            json={"embeds": [embed.to_dict()]},
+        )
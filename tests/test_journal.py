@@ -0,0 +1,106 @@
+import asyncio
+import shutil
+import tempfile
+import unittest
+
+from pymongo.errors import ConnectionFailure
+
+from bot import ModmailBot
+from core.config import ConfigManager
+from core.journal import Journal
+from core.metrics import MetricsRegistry
+
+
+class StubDatabase:
+    """The config document, kept across restarts of the bot."""
+
+    def __init__(self):
+        self.config = {}
+        self.up = True
+
+
+class StubAPI:
+    def __init__(self, bot, db):
+        self.bot = bot
+        self.db = db
+
+    async def validate_database_connection(self):
+        pass
+
+    async def setup_indexes(self):
+        pass
+
+    async def get_config(self):
+        return dict(self.db.config)
+
+    async def update_config(self, data):
+        toset = self.bot.config.filter_valid(data)
+        unset = {k: 1 for k in self.bot.config.all_keys if k not in data}
+        return await self.bot.journal.append("update_config", {"toset": toset, "unset": unset})
+
+    async def apply_journal_entry(self, op, args):
+        if not self.db.up:
+            raise ConnectionFailure("database is down")
+        if op == "update_config":
+            for key in args["unset"]:
+                self.db.config.pop(key, None)
+            self.db.config.update(args["toset"])
+
+
+class StubBot:
+    _connect_phase = ModmailBot._connect_phase
+    on_connect = ModmailBot.on_connect
+
+    def __init__(self, loop, db, path):
+        self.loop = loop
+        self.metrics = MetricsRegistry()
+        self.api = StubAPI(self, db)
+        self.config = ConfigManager(self)
+        self.config.populate_cache()
+        self.config["db_journal"] = True
+        self.config["db_journal_path"] = path
+        self.journal = Journal(self)
+        self._connected = asyncio.Event()
+        self.connect_timings = {}
+
+
+class JournalRestartTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.path = tempfile.mkdtemp()
+        self.db = StubDatabase()
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.path)
+
+    def test_config_write_survives_restart(self):
+        async def before_restart():
+            bot = StubBot(self.loop, self.db, self.path)
+            await bot.on_connect()
+            self.db.up = False
+            bot.config["prefix"] = "!"
+            await bot.config.update()
+            await bot.journal.close()
+
+        async def after_restart():
+            bot = StubBot(self.loop, self.db, self.path)
+            await bot.on_connect()
+            # Any later update writes the cached config back
+            await bot.config.update()
+            await bot.journal.drain(5)
+            await bot.journal.close()
+            return bot
+
+        self.loop.run_until_complete(before_restart())
+        self.assertNotIn("prefix", self.db.config)
+
+        self.db.up = True
+        bot = self.loop.run_until_complete(after_restart())
+
+        self.assertEqual(bot.config["prefix"], "!")
+        self.assertEqual(self.db.config.get("prefix"), "!")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,234 @@
+import asyncio
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from bot import ModmailBot
+from cogs.Soporte import Soporte
+from core.config import ConfigManager
+from core.metrics import MetricsRegistry
+from core.thread import Thread, ThreadManager
+from core.tracing import Tracer
+
+
+class StubChannel:
+    def __init__(self, channel_id, name, topic):
+        self.id = channel_id
+        self.name = name
+        self.topic = topic
+        self.created_at = datetime.utcnow()
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    async def send(self, *args, **kwargs):
+        return SimpleNamespace(pin=self.pin)
+
+    async def pin(self):
+        pass
+
+
+class StubGuild:
+    def __init__(self):
+        self.default_role = object()
+        self.icon_url = ""
+        self.text_channels = []
+
+    async def create_text_channel(self, *, name, topic, **kwargs):
+        # Give the other caller a chance to run while Discord "creates" it
+        await asyncio.sleep(0.01)
+        channel = StubChannel(len(self.text_channels) + 1, name, topic)
+        self.text_channels.append(channel)
+        return channel
+
+    def get_member(self, user_id):
+        return None
+
+
+class StubAPI:
+    def __init__(self):
+        self.logs = []
+
+    async def create_log_entry(self, recipient, channel, creator):
+        await asyncio.sleep(0.01)
+        self.logs.append(channel.id)
+        return f"https://logs/{channel.id}"
+
+    async def get_user_logs(self, user_id):
+        return []
+
+
+class StubCategories:
+    async def allocate(self):
+        # Allocating may wait on Discord, let the other caller run
+        await asyncio.sleep(0.01)
+        return None
+
+    def release(self, category, channel=None):
+        pass
+
+
+class StubChannelNames:
+    def reserve(self, recipient):
+        return recipient.name
+
+    def release(self, name, channel=None):
+        pass
+
+
+class StubBot:
+    relay_dm_modmail = ModmailBot.relay_dm_modmail
+    _relay_dm_modmail = ModmailBot._relay_dm_modmail
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.modmail_guild = self.guild = StubGuild()
+        self.main_category = None
+        self.api = StubAPI()
+        self.categories = StubCategories()
+        self.channel_names = StubChannelNames()
+        self.metrics = MetricsRegistry()
+        self.config = ConfigManager(self)
+        self.config.populate_cache()
+        self.main_color = self.mod_color = 0
+        self.user = SimpleNamespace(id=1)
+        self.threads = ThreadManager(self)
+        self.tracer = Tracer(self)
+
+    def dispatch(self, event, *args):
+        pass
+
+    async def _process_blocked(self, message, react_to=None):
+        await asyncio.sleep(0)
+        return False
+
+    async def get_thread_cooldown(self, author):
+        await asyncio.sleep(0)
+
+    async def retrieve_emoji(self):
+        return "✅", "🚫"
+
+    async def add_reaction(self, msg, reaction):
+        return True
+
+    def get_channel(self, channel_id):
+        return next((c for c in self.guild.text_channels if c.id == channel_id), None)
+
+
+class StubRecipient:
+    id = 1234
+    bot = False
+    name = "recipient"
+    mention = "<@1234>"
+    avatar_url = ""
+    created_at = datetime(2020, 1, 1)
+
+    def __init__(self, user_id=None, name=None):
+        if user_id is not None:
+            self.id = user_id
+            self.name = name
+            self.mention = f"<@{user_id}>"
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, *args, **kwargs):
+        return SimpleNamespace()
+
+
+class FindOrCreateTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.bot = StubBot(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_concurrent_calls_create_one_thread(self):
+        recipient = StubRecipient()
+
+        async def race():
+            threads = await asyncio.gather(
+                self.bot.threads.find_or_create(recipient),
+                self.bot.threads.find_or_create(recipient),
+            )
+            # Let the setup task finish
+            await threads[0].wait_until_ready()
+            await asyncio.sleep(0.05)
+            return threads
+
+        first, second = self.loop.run_until_complete(race())
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.bot.guild.text_channels), 1)
+        self.assertEqual(self.bot.api.logs, [first.channel.id])
+        self.assertFalse(self.bot.threads._guards)
+
+    def test_concurrent_calls_replace_a_stale_thread_once(self):
+        recipient = StubRecipient()
+
+        async def close(**kwargs):
+            pass
+
+        # A thread whose channel was deleted, both callers have to replace it
+        stale = Thread(self.bot.threads, recipient, StubChannel(999, "deleted", None))
+        stale.close = close
+        stale.ready = True
+        self.bot.threads.cache[recipient.id] = stale
+
+        async def race():
+            threads = await asyncio.gather(
+                self.bot.threads.find_or_create(recipient),
+                self.bot.threads.find_or_create(recipient),
+            )
+            await threads[0].wait_until_ready()
+            await asyncio.sleep(0.05)
+            return threads
+
+        first, second = self.loop.run_until_complete(race())
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, stale)
+        self.assertEqual(len(self.bot.guild.text_channels), 1)
+        self.assertEqual(self.bot.api.logs, [first.channel.id])
+
+    def test_dm_and_contact_create_one_thread(self):
+        recipient = StubRecipient()
+        moderator = StubRecipient(5678, "moderator")
+        dm = SimpleNamespace(id=1, author=recipient, channel=recipient)
+        ctx = SimpleNamespace(
+            author=moderator,
+            channel=StubChannel(50, "commands", None),
+            message=SimpleNamespace(id=2),
+        )
+        cog = Soporte(self.bot)
+        relayed = []
+
+        async def send(thread, message, *args, **kwargs):
+            relayed.append((thread, message))
+
+        async def race():
+            contact = self.loop.create_task(cog.contact.callback(cog, ctx, recipient))
+            await self.bot.relay_dm_modmail(dm)
+            thread = self.bot.threads.cache[recipient.id]
+            await thread.wait_until_ready()
+            await asyncio.sleep(0.05)
+            # It waits a few seconds before deleting the command message, it
+            # shouldn't have finished or failed yet
+            self.assertFalse(contact.done())
+            contact.cancel()
+            await asyncio.gather(contact, return_exceptions=True)
+            return thread
+
+        with mock.patch.object(Thread, "send", send):
+            thread = self.loop.run_until_complete(race())
+
+        self.assertEqual(len(self.bot.guild.text_channels), 1)
+        self.assertEqual(self.bot.api.logs, [thread.channel.id])
+        self.assertEqual(relayed, [(thread, dm)])
+
+
+if __name__ == "__main__":
+    unittest.main()